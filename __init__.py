@@ -1,16 +1,31 @@
 
+from .package_manager import PackageManager
+from .common.metrics import get_logger, register_metrics_routes
 from .art_gen.artbot import Artbot
 from .text_gen.lollms_text_gen import Lollms_Text_Gen
 from .text_gen.lollms_text_save import Lollms_Text_Saver
+from .text_gen.lollms_prompt_export import Lollms_Prompt_Exporter
+from .text_gen.lollms_text_visualize import Lollms_Text_Visualize
 from .video_gen.randomize_video import RandomizeVideo
 
+# Registration only imports light modules, torch, comfy and requests are imported when a node first runs.
+# Missing dependencies are reported here instead of being installed on the import path.
+_missing = PackageManager.missing_packages(["requests"])
+if _missing:
+    get_logger("setup").warning("lollms_nodes_suite: missing dependencies %s, the lollms nodes will fail until you run: pip install -r requirements.txt", ", ".join(_missing))
+
+# Metrics are served at /lollms_nodes/metrics (Prometheus) and /lollms_nodes/metrics.json when running in comfyui
+register_metrics_routes()
+
 # A dictionary that contains all nodes you want to export with their names
 # NOTE: names should be globally unique
 NODE_CLASS_MAPPINGS = {
     "Artbot": Artbot,
     "RandomizeVideo":RandomizeVideo,
     "Lollms_Text_Gen": Lollms_Text_Gen,
-    "Lollms_Text_Saver": Lollms_Text_Saver
+    "Lollms_Text_Saver": Lollms_Text_Saver,
+    "Lollms_Prompt_Exporter": Lollms_Prompt_Exporter,
+    "Lollms_Text_Visualize": Lollms_Text_Visualize
 }
 
 # A dictionary that contains the friendly/humanly readable titles for the nodes
@@ -18,7 +33,12 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "Artbot": "Artbot Node",
     "Lollms": "Lollms_Text_Gen",
     "Lollms": "Lollms_Text_Saver",
-    "RandomizeVideo": "RandomizeVideo"
+    "RandomizeVideo": "RandomizeVideo",
+    "Lollms_Prompt_Exporter": "Lollms_Prompt_Exporter",
+    "Lollms_Text_Visualize": "Lollms_Text_Visualize"
 }
 
-__all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS']
\ No newline at end of file
+# Frontend extensions, the text viewer of Lollms_Text_Visualize
+WEB_DIRECTORY = "./web"
+
+__all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS', 'WEB_DIRECTORY']
\ No newline at end of file
@@ -1,14 +1,275 @@
-from ..package_manager import PackageManager
-if not PackageManager.check_package_installed("lollms_client"):
-    PackageManager.install_package("lollms_client")
-
-import comfy.model_management
-from lollms_client import LollmsClient
-import torch
-from torchvision.transforms import Compose, Resize, CenterCrop
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from functools import reduce
+from ..common.async_nodes import comfy_supports_async_nodes
+from ..common.change_detection import ALWAYS_CHANGED, hash_inputs
+from ..common.conditioning_cache import get_conditioning_cache
+from ..common.generation import submit_generations
+from ..common.latents import LATENT_ALLOCATIONS, LATENT_DTYPES, empty_latent, ensure_memory_available, replicate_latent, tensor_nbytes, torch_dtype
+from ..common.metrics import get_logger, get_metrics, instrument_node
+from ..common.prompt_memory import PROMPT_MEMORY_MODES, format_examples, get_prompt_memory, memory_scope
+from ..common.prompt_templates import get_template_library
+from ..common.streaming import ClipTokenBudget, StreamProgress
+from ..common.timing import PhaseTimer
+from .prompt_parsing import parse_combined_answer
+from ..common.response_cache import CACHE_MODES
+from ..common.scheduler import PRIORITIES
 
 MAX_RESOLUTION=16384
 
+logger = get_logger("artbot")
+
+DEFAULT_NEGATIVE_PROMPT = "(((ugly))), (((duplicate))), ((morbid)), ((mutilated)), out of frame, extra fingers, mutated hands, ((poorly drawn hands)), ((poorly drawn face)), (((mutation))), (((deformed))), blurry, ((bad anatomy)), (((bad proportions))), ((extra limbs)), cloned face, (((disfigured))), ((extra arms)), (((extra legs))), mutated hands, (fused fingers), (too many fingers), (((long neck))), ((watermark)), ((robot eyes))"
+
+def build_positive_request(prompt, style="", language="", template="artbot_positive", max_input_tokens=0, examples=""):
+    return get_template_library().get(template).render(subject=prompt, style=style, language=language, max_input_tokens=max_input_tokens, examples=examples)
+
+def build_negative_request(prompt, style="", language="", template="artbot_negative", max_input_tokens=0, examples=""):
+    return get_template_library().get(template).render(subject=prompt, style=style, language=language, default_negative=DEFAULT_NEGATIVE_PROMPT, max_input_tokens=max_input_tokens, examples=examples)
+
+def build_combined_request(prompt, style="", language="", template="artbot_combined", max_input_tokens=0, examples=""):
+    return get_template_library().get(template).render(subject=prompt, style=style, language=language, default_negative=DEFAULT_NEGATIVE_PROMPT, max_input_tokens=max_input_tokens, examples=examples)
+
+def encode_prompt(clip, prompt):
+    return get_conditioning_cache().encode(clip, prompt)
+
+def batch_conditionings(encoded):
+    """
+        Merges a list of `(cond, pooled)` pairs into a single conditioning batch.
+        Prompts longer than 77 tokens produce longer conditionings, they are repeated up to a common length
+        the same way comfyui concatenates conditionings of different lengths.
+    """
+    if len(encoded) == 1:
+        return encoded[0]
+    import torch
+    conds = [cond for cond, _ in encoded]
+    length = reduce(lambda a, b: a * b // math.gcd(a, b), [cond.shape[1] for cond in conds])
+    conds = [cond.repeat(1, length // cond.shape[1], 1) for cond in conds]
+    return torch.cat(conds), torch.cat([pooled for _, pooled in encoded])
+
+def encode_frames(vae, frames, chunk_size):
+    """
+        VAE encodes a frame batch, `chunk_size` frames at a time to cap peak memory (0 encodes the whole batch at once).
+    """
+    with get_metrics().span("vae_encode"):
+        if chunk_size <= 0 or chunk_size >= frames.shape[0]:
+            return vae.encode(frames)
+        import torch
+        return torch.cat([vae.encode(frames[start:start + chunk_size]) for start in range(0, frames.shape[0], chunk_size)])
+
+class ArtbotRun:
+    """
+    One Artbot execution.
+
+    The lollms requests are sent as soon as the run is created, then everything that doesn't depend on the
+    answers (default negative prompt encoding, input image preprocessing and VAE encoding) is prepared while
+    lollms generates. Answers are CLIP encoded as they arrive through `add_answer`, `finish` builds the outputs.
+    With the prompt memory, subjects close to an already expanded one reuse its expansion without any request
+    (REUSE) or send it as an example (FEW_SHOT), and new expansions are remembered.
+    With prompt_requests=COMBINED, the positive and negative prompts of a subject are asked in a single request,
+    an answer that can't be parsed is asked again as two separate requests.
+    """
+    def __init__(self, node, clip, lollms_host, build_negative_prompt, width, height, batch_size, prompt, input_image=None, vae=None, multi_prompt="NO", max_concurrency=4, stream="NO", max_clip_chunks=3, max_tokens=1024, latent_replication="ENCODE_ONCE", vae_encode_chunk=0, seed=0, regenerate="NO", positive_template="artbot_positive", negative_template="artbot_negative", style="", language="", max_input_tokens=0, latent_dtype="float32", latent_allocation="MATERIALIZED", prompt_memory="OFF", memory_threshold=0.8, priority="interactive", prompt_requests="SEPARATE", combined_template="artbot_combined", cache="on"):
+        self.node = node
+        self.clip = clip
+        self.build_negative_prompt = build_negative_prompt
+        if multi_prompt=="YES":
+            self.subjects = [line.strip() for line in prompt.splitlines() if line.strip()] or [prompt]
+        else:
+            self.subjects = [prompt]
+        # Impossible sizes are rejected before spending time on lollms
+        self.check_memory(width, height, batch_size, input_image, latent_replication, latent_dtype, latent_allocation)
+
+        if regenerate=="YES":
+            cache = "refresh"
+        params = {"n_predict": max_tokens}
+        if seed:
+            params["seed"] = seed
+
+        self.timer = PhaseTimer()
+        self.total_start = time.perf_counter()
+        cache_tag = f"max_clip_chunks={max_clip_chunks}" if stream=="YES" else None
+        kinds = [("positive", positive_template)] * len(self.subjects)
+        if build_negative_prompt=="YES":
+            kinds += [("negative", negative_template)] * len(self.subjects)
+        subjects = self.subjects * (len(kinds) // len(self.subjects))
+        self.encoded = [None] * len(kinds)
+        self.answers = [None] * len(kinds)
+
+        remembered, examples = self.recall(prompt_memory, memory_threshold, kinds, subjects, cache=="refresh", prompt_requests=="COMBINED", style=style.strip(), language=language.strip())
+        self.build_single_request = lambda index: (build_positive_request if kinds[index][0]=="positive" else build_negative_request)(subjects[index], style, language, kinds[index][1], max_input_tokens, examples.get(index, ""))
+        self.submit_settings = dict(lollms_host=lollms_host, cache=cache, max_workers=max_concurrency, cache_tag=cache_tag, priority=priority, **params)
+        # Each request fills one answer, or the positive and the negative answers of a subject when combined
+        groups = []
+        for index in range(len(kinds)):
+            if index in remembered:
+                continue
+            negative_index = index + len(self.subjects)
+            if prompt_requests=="COMBINED" and kinds[index][0]=="positive" and negative_index < len(kinds) and negative_index not in remembered:
+                groups.append(((index, negative_index), build_combined_request(subjects[index], style, language, combined_template, max_input_tokens, examples.get(index, ""))))
+            elif not (prompt_requests=="COMBINED" and kinds[index][0]=="negative" and index - len(self.subjects) not in remembered):
+                groups.append(((index,), self.build_single_request(index)))
+        if stream=="YES" and groups:
+            # Streamed answers stop as soon as they fill the CLIP chunk budget, a combined answer holds two prompts so it is never cut
+            self.progress = StreamProgress(len(groups), max_tokens)
+            callbacks = [self.progress.callback(position, ClipTokenBudget(clip, max_clip_chunks) if len(indices) == 1 else None) for position, (indices, _) in enumerate(groups)]
+        else:
+            self.progress = None
+            callbacks = None
+        # All the lollms requests of the run are sent together so the server sees them concurrently,
+        # each answer is encoded as soon as it arrives while the other requests are still in flight
+        self.request_indices = {}
+        self.llm_start = time.perf_counter()
+        self.futures = self.submit(groups, callbacks)
+
+        # From here on lollms is generating, prepare what doesn't need its answers
+        for index, answer in remembered.items():
+            self.use_answer(index, answer, remember=False)
+        if build_negative_prompt!="YES":
+            self.negative_prompts = [DEFAULT_NEGATIVE_PROMPT if build_negative_prompt=="USE_DEFAULT" else ""]
+            with self.timer.phase("clip_encode"):
+                self.negative_encoded = encode_prompt(clip, self.negative_prompts[0])
+        with self.timer.phase("latent"):
+            self.latent = self.build_latent(width, height, batch_size, input_image, vae, latent_replication, vae_encode_chunk, latent_dtype, latent_allocation)
+
+    def recall(self, prompt_memory, memory_threshold, kinds, subjects, refresh, combined, **settings):
+        """
+            Looks the subjects up in the prompt memory, returns the remembered answers to reuse and the
+            examples to add to the requests, both keyed by request index. Combined requests only get the
+            examples of their positive prompt.
+        """
+        remembered = {}
+        examples = {}
+        self.memory = None
+        if prompt_memory=="OFF":
+            return remembered, examples
+        self.memory = get_prompt_memory()
+        self.scopes = [memory_scope(kind=kind, template=template, **settings) for kind, template in kinds]
+        self.refresh = refresh
+        for index, subject in enumerate(subjects):
+            if prompt_memory=="REUSE":
+                if refresh:
+                    continue
+                matches = self.memory.find(self.scopes[index], subject, memory_threshold)
+                if matches:
+                    remembered[index] = matches[0][2]
+                    logger.debug("Reusing the expansion of %r (similarity %.2f) for %r", matches[0][1], matches[0][0], subject)
+            else:
+                if combined and kinds[index][0]=="negative":
+                    continue
+                matches = self.memory.find(self.scopes[index], subject, memory_threshold, limit=2)
+                if matches:
+                    examples[index] = format_examples(matches)
+            get_metrics().increment("prompt_memory", mode=prompt_memory.lower(), result="hit" if matches else "miss")
+        return remembered, examples
+
+    def check_memory(self, width, height, batch_size, input_image, latent_replication, latent_dtype, latent_allocation):
+        import comfy.model_management
+        hint = "Lower batch_size or the resolution, or use latent_allocation=BROADCAST or a 16 bit latent_dtype."
+        frames = batch_size * len(self.subjects)
+        latent_shape = [4, height // 8, width // 8]
+        if input_image is None:
+            latent_frames = 1 if latent_allocation=="BROADCAST" else frames
+        else:
+            pixel_frames = input_image.shape[0] * (frames if latent_replication=="ENCODE_EACH" else 1)
+            ensure_memory_available(tensor_nbytes([pixel_frames, height, width, 3]), comfy.model_management.get_torch_device(), "The preprocessed input_image batch", hint)
+            broadcast = latent_allocation=="BROADCAST" and latent_replication=="ENCODE_ONCE" and input_image.shape[0] == 1
+            latent_frames = 1 if broadcast else input_image.shape[0] * frames
+        ensure_memory_available(tensor_nbytes([latent_frames] + latent_shape, latent_dtype), self.node.device, "The Artbot latent batch", hint)
+
+    def build_latent(self, width, height, batch_size, input_image, vae, latent_replication, vae_encode_chunk, latent_dtype, latent_allocation):
+        # Heavy imports are deferred to the first execution to keep comfyui startup fast
+        import comfy.model_management
+        from .image_ops import fit_and_center_crop
+
+        if input_image is None:
+            return empty_latent(batch_size * len(self.subjects), height // 8, width // 8, self.node.device, latent_dtype, latent_allocation)
+        # Resize and crop the whole batch at once on the compute device
+        with get_metrics().span("resize"):
+            processed_batch = fit_and_center_crop(input_image, width, height, device=comfy.model_management.get_torch_device())
+        repeats = batch_size*len(self.subjects)
+        if latent_replication=="ENCODE_ONCE":
+            # Identical frames give identical latents, encode each frame once and replicate the latents
+            latent = encode_frames(vae, processed_batch, vae_encode_chunk).to(torch_dtype(latent_dtype))
+            latent = replicate_latent(latent, repeats, latent_allocation)
+        else:
+            if repeats > 1:
+                processed_batch = processed_batch.repeat(repeats, 1, 1, 1)
+            latent = encode_frames(vae, processed_batch, vae_encode_chunk).to(torch_dtype(latent_dtype))
+        return latent
+
+    def submit(self, groups, callbacks=None):
+        """
+            Sends `(indices, request)` groups to lollms and returns their futures.
+        """
+        if not groups:
+            return []
+        futures = submit_generations(prompts=[request for _, request in groups], streaming_callbacks=callbacks, **self.submit_settings)
+        for future, (indices, _) in zip(futures, groups):
+            self.request_indices[future] = (indices, callbacks is not None)
+        return futures
+
+    def add_answer(self, future):
+        """
+            Handles a completed request, returns the futures of the requests sent again when a combined answer is malformed.
+        """
+        position, answer, seconds = future.result()
+        indices, streamed = self.request_indices.pop(future)
+        if streamed:
+            self.progress.finish(position)
+        if len(indices) == 1:
+            self.timer.add("positive_llm" if indices[0] < len(self.subjects) else "negative_llm", seconds)
+            self.use_answer(indices[0], answer)
+            return []
+        self.timer.add("combined_llm", seconds)
+        parsed = parse_combined_answer(answer)
+        get_metrics().increment("combined_requests", result="parsed" if parsed else "fallback")
+        if parsed is None:
+            logger.warning("Could not find the positive and negative prompts in the lollms answer, asking them separately: %r", answer)
+            return self.submit([((index,), self.build_single_request(index)) for index in indices])
+        for index, text in zip(indices, parsed):
+            self.use_answer(index, text)
+        return []
+
+    def use_answer(self, index, answer, remember=True):
+        if remember and self.memory is not None and answer.strip():
+            self.memory.add(self.scopes[index], self.subjects[index % len(self.subjects)], answer, replace=self.refresh)
+        self.answers[index] = answer
+        with self.timer.phase("clip_encode"):
+            self.encoded[index] = encode_prompt(self.clip, answer)
+
+    def finish(self):
+        self.timer.add("llm_wall", time.perf_counter() - self.llm_start)
+        subjects = self.subjects
+        positive_cond, positive_pooled = batch_conditionings(self.encoded[:len(subjects)])
+        if self.build_negative_prompt=="YES":
+            negative_prompts = self.answers[len(subjects):]
+            negative_cond, negative_pooled = batch_conditionings(self.encoded[len(subjects):])
+        else:
+            negative_prompts = self.negative_prompts
+            negative_cond, negative_pooled = self.negative_encoded
+        logger.debug("Positive conditioning %s, negative conditioning %s, negative prompts %s", tuple(positive_cond.shape), tuple(negative_cond.shape), negative_prompts)
+
+        latent = self.latent
+        if len(subjects) > 1:
+            # Each subject drives a contiguous slice of the latent batch
+            repeats = latent.shape[0] // len(subjects)
+            positive_cond, positive_pooled = positive_cond.repeat_interleave(repeats, 0), positive_pooled.repeat_interleave(repeats, 0)
+            if negative_cond.shape[0] > 1:
+                negative_cond, negative_pooled = negative_cond.repeat_interleave(repeats, 0), negative_pooled.repeat_interleave(repeats, 0)
+        self.timer.add("total", time.perf_counter() - self.total_start)
+        self.node.last_timings = self.timer.timings
+        logger.info("artbot_timings %s", self.timer.summary(), extra={"timings_ms": self.timer.milliseconds()})
+
+        return ([[positive_cond, {"pooled_output": positive_pooled}]], 
+                [[negative_cond, {"pooled_output": negative_pooled}]],
+                {"samples":latent},
+                self.timer.to_json(),
+                # The prompts of the subjects are joined in multi prompt mode, so they can go to Lollms_Prompt_Exporter
+                "\n".join(self.answers[:len(subjects)]),
+                "\n".join(negative_prompts),)
+
 class Artbot:
     """
     A Artbot node
@@ -39,8 +300,9 @@ class Artbot:
         For Artbot, if `FUNCTION = "execute"` then this method's name must be `execute`, if `FUNCTION = "foo"` then it must be `foo`.
     """
     def __init__(self):
+        import comfy.model_management
         self.device = comfy.model_management.intermediate_device()
-        self.lollms = LollmsClient()
+        self.last_timings = {}
     
     @classmethod
     def INPUT_TYPES(s):
@@ -77,88 +339,66 @@ class Artbot:
             "optional": {
                 "input_image":("IMAGE",), 
                 "vae":("VAE",),
+                "multi_prompt":(["NO","YES"],),
+                "max_concurrency": ("INT", {"default": 4, "min": 1, "max": 64}),
+                "stream":(["NO","YES"],),
+                "max_clip_chunks": ("INT", {"default": 3, "min": 1, "max": 32}),
+                "max_tokens": ("INT", {"default": 1024, "min": 16, "max": 8192}),
+                "latent_replication":(["ENCODE_ONCE","ENCODE_EACH"],),
+                "vae_encode_chunk": ("INT", {"default": 0, "min": 0, "max": 4096}),
+                # 0 lets lollms pick, a fixed seed keeps the answer reproducible and cacheable, so comfyui must not randomize it
+                "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffff, "control_after_generate": False}),
+                "regenerate":(["NO","YES"],),
+                "positive_template":(get_template_library().names("artbot_positive"),),
+                "negative_template":(get_template_library().names("artbot_negative"),),
+                "style": ("STRING", {"multiline": False, "default": ""}),
+                "language": ("STRING", {"multiline": False, "default": ""}),
+                "max_input_tokens": ("INT", {"default": 0, "min": 0, "max": 8192}),
+                "latent_dtype":(LATENT_DTYPES,),
+                "latent_allocation":(LATENT_ALLOCATIONS,),
+                "prompt_memory":(PROMPT_MEMORY_MODES,),
+                "memory_threshold": ("FLOAT", {"default": 0.8, "min": 0.0, "max": 1.0, "step": 0.05}),
+                "priority":(PRIORITIES,),
+                "prompt_requests":(["SEPARATE","COMBINED"],),
+                "combined_template":(get_template_library().names("artbot_combined"),),
+                # Appended after the older widgets so saved workflows keep their widget values
+                "cache":(CACHE_MODES, {"default": "on"}),
             },
         }
 
-    RETURN_TYPES = ("CONDITIONING", "CONDITIONING", "LATENT")
-    RETURN_NAMES = ("Positive", "Negative", "latent",)
+    RETURN_TYPES = ("CONDITIONING", "CONDITIONING", "LATENT", "STRING", "STRING", "STRING")
+    RETURN_NAMES = ("Positive", "Negative", "latent", "timings", "positive_prompt", "negative_prompt",)
 
-    FUNCTION = "build_prompt"
+    # comfyui versions that await coroutine node functions keep executing while lollms generates
+    FUNCTION = "build_prompt_async" if comfy_supports_async_nodes() else "build_prompt"
 
     #OUTPUT_NODE = False
 
     CATEGORY = "Lollms/Artbot"
 
-    def build_prompt(self, clip, lollms_host, build_negative_prompt, width, height, batch_size, prompt, input_image=None, vae=None):
-        #do some processing on the image, in this Artbot I just invert it
-        full_prompt = "\n".join([
-            "!@>system: Act as Artbot, Use the user prompt as a subject then build an image generation prompt for a captivating art.",
-            "Start by a very simple description of the artwork, then follow up with tags or art styles, here are some examples of tags 'whimsical pop-surrealist style, autumn forest, magical fairies, vibrant colors, highres, 8k, cyberpunk, steampunk, Best quality, UHD, HDR, contemporary impressionism etc', you can also give an information about the camera and the shot parameters if needed.",
-            "Use as much tags as you need. Only use tags that serve the project of artwork. If needed evoke the name of an artist  This concise prompt sparks curiosity and enriches user's artistic experience.",
-            "If the user prompt is in another language than english, use it as a guideline and write an english prompt.",
-            "!@>user:",
-            prompt,
-            "!@>artbot:"
-        ])
-        positive_prompt = self.lollms.generate_text(lollms_host,full_prompt)
-        tokens = clip.tokenize(positive_prompt)
-        positive_cond, positive_pooled = clip.encode_from_tokens(tokens, return_pooled=True)
-        print(f"Positive conditionning: {positive_cond}")
-
-        if build_negative_prompt=="USE_DEFAULT":
-            neg_prompt = "(((ugly))), (((duplicate))), ((morbid)), ((mutilated)), out of frame, extra fingers, mutated hands, ((poorly drawn hands)), ((poorly drawn face)), (((mutation))), (((deformed))), blurry, ((bad anatomy)), (((bad proportions))), ((extra limbs)), cloned face, (((disfigured))), ((extra arms)), (((extra legs))), mutated hands, (fused fingers), (too many fingers), (((long neck))), ((watermark)), ((robot eyes))"
-        elif build_negative_prompt=="YES":
-            full_prompt = "!@>system: Build a list of expressions that shouldn't be in the an artwork built from the user prompt. example (((ugly))), (((duplicate))), ((morbid)), ((mutilated)), out of frame, extra fingers, mutated hands, ((poorly drawn hands)), ((poorly drawn face)), (((mutation))), (((deformed))), blurry, ((bad anatomy)), (((bad proportions))), ((extra limbs)), cloned face, (((disfigured))), ((extra arms)), (((extra legs))), mutated hands, (fused fingers), (too many fingers), (((long neck))), ((watermark)), ((robot eyes)).\nUse the user prompt as a base to determine this list and answer only with the list.\n!@>user:" + prompt + "!@>artbot:"
-            neg_prompt = self.lollms.generate_text(lollms_host,full_prompt)
-        else:
-            neg_prompt = ""
-        tokens = clip.tokenize(neg_prompt)
-        negative_cond, negative_pooled = clip.encode_from_tokens(tokens, return_pooled=True)
-        print(f"Negative conditionning: {neg_prompt}")
-
-        if input_image is not None:
-            # First, determine how to resize the image without changing its aspect ratio
-            def resize_keep_aspect_ratio(img, target_width, target_height):
-                # Convert from HWC to CHW format which is expected by torchvision transforms
-                img = img.permute(2, 0, 1)
-                # Get the original dimensions
-                orig_height, orig_width = img.shape[1], img.shape[2]
-                # Calculate the scaling factors for both dimensions
-                scale_width = target_width / orig_width
-                scale_height = target_height / orig_height
-                # Choose the larger scaling factor to ensure the image covers the target dimensions
-                scale_factor = min(scale_width, scale_height)
-                # Calculate the resized dimensions
-                new_width = int(orig_width * scale_factor)
-                new_height = int(orig_height * scale_factor)
-                # Resize the image
-                resize_transform = Resize((new_height, new_width))
-                resized_img = resize_transform(img)
-
-                return resized_img
-            # Apply the transformations to each image in the batch
-            processed_images = []
-            for i in range(input_image.shape[0]):
-                img = input_image[i,...]
-                resized_img = resize_keep_aspect_ratio(img, width, height)
-                # Now, center crop to the target dimensions
-                crop_transform = CenterCrop((height, width))
-                cropped_img = crop_transform(resized_img)
-                # Convert from HWC to CHW format which is expected by torchvision transforms
-                cropped_img = cropped_img.permute(1, 2, 0)
-                
-                processed_images.append(cropped_img)
-
-            # Stack processed images back into a batch
-            processed_batch = torch.stack(processed_images*batch_size)
-            # Encode the processed batch using VAE
-            latent = vae.encode(processed_batch)
-        else:
-            latent = torch.zeros([batch_size, 4, height // 8, width // 8], device=self.device)
+    @instrument_node
+    def build_prompt(self, *args, **kwargs):
+        run = ArtbotRun(self, *args, **kwargs)
+        futures = set(run.futures)
+        while futures:
+            done, futures = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                futures.update(run.add_answer(future))
+        return run.finish()
 
-        return ([[positive_cond, {"pooled_output": positive_pooled}]], 
-                [[negative_cond, {"pooled_output": negative_pooled}]],
-                {"samples":latent},)
+    @instrument_node
+    async def build_prompt_async(self, *args, **kwargs):
+        """
+            Same as build_prompt, but awaits the lollms answers instead of blocking the comfyui execution.
+        """
+        import asyncio
+        run = ArtbotRun(self, *args, **kwargs)
+        waiting = {asyncio.wrap_future(future): future for future in run.futures}
+        while waiting:
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                waiting.update({asyncio.wrap_future(future): future for future in run.add_answer(waiting.pop(task))})
+        return run.finish()
 
     """
         The node will always be re executed if any of the inputs change but
@@ -168,9 +408,12 @@ class Artbot:
         This method is used in the core repo for the LoadImage node where they return the image hash as a string, if the image hash
         changes between executions the LoadImage node is executed again.
     """
-    #@classmethod
-    #def IS_CHANGED(s, image, string_field, int_field, float_field, print_to_screen):
-    #    return ""
+    @classmethod
+    def IS_CHANGED(s, regenerate="NO", **kwargs):
+        if regenerate=="YES":
+            return ALWAYS_CHANGED
+        templates = get_template_library().fingerprint(kwargs.get("positive_template", "artbot_positive"), kwargs.get("negative_template", "artbot_negative"), kwargs.get("combined_template", "artbot_combined"))
+        return hash_inputs(templates=templates, **kwargs)
 
 # Set the web directory, any .js file in that directory will be loaded by the frontend as a frontend extension
 # WEB_DIRECTORY = "./somejs"
@@ -0,0 +1,38 @@
+import torch.nn.functional as F
+
+
+def fit_and_center_crop(images, width, height, device=None):
+    """
+        Resizes a whole NHWC image batch to fit inside (height, width) without changing its aspect ratio,
+        then center crops it to exactly (height, width), padding with zeros where the image is smaller.
+        This is the batched equivalent of torchvision's Resize followed by CenterCrop applied image by image.
+
+        images (`torch.Tensor`):
+            NHWC float batch as produced by comfyui IMAGE outputs.
+        device (`torch.device`):
+            Device used for the resize, defaults to the device of the images.
+    """
+    if device is not None:
+        images = images.to(device, non_blocking=True)
+    orig_height, orig_width = images.shape[1], images.shape[2]
+    scale_factor = min(width / orig_width, height / orig_height)
+    new_width = int(orig_width * scale_factor)
+    new_height = int(orig_height * scale_factor)
+
+    # NHWC -> NCHW is a view, interpolate reads it without an explicit copy
+    batch = images.permute(0, 3, 1, 2)
+    if (new_height, new_width) != (orig_height, orig_width):
+        batch = F.interpolate(batch, size=(new_height, new_width), mode="bilinear", align_corners=False, antialias=True)
+
+    # Offsets follow torchvision's CenterCrop: crop when larger, zero pad when smaller
+    crop_top = int(round((new_height - height) / 2.0)) if new_height > height else 0
+    crop_left = int(round((new_width - width) / 2.0)) if new_width > width else 0
+    images = batch[:, :, crop_top:crop_top + height, crop_left:crop_left + width].permute(0, 2, 3, 1)
+    if images.shape[1] != height or images.shape[2] != width:
+        pad_top = (height - images.shape[1]) // 2
+        pad_left = (width - images.shape[2]) // 2
+        output = images.new_zeros((images.shape[0], height, width, images.shape[3]))
+        output[:, pad_top:pad_top + images.shape[1], pad_left:pad_left + images.shape[2], :] = images
+        return output
+    # interpolate returns a channels last tensor, so this is usually free
+    return images.contiguous()
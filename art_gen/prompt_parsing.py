@@ -0,0 +1,60 @@
+import json
+import re
+
+# "POSITIVE:", "**Negative prompt:**", "## Positive" ... at the beginning of a line
+_SECTION_HEADER = re.compile(r"^[ \t>#*_-]*(positive|negative)(?:[ \t]+prompts?)?[ \t*_]*(?:[:：=]|-(?=\s)|$)[ \t*_]*", re.IGNORECASE | re.MULTILINE)
+_CODE_FENCE = re.compile(r"^```[\w-]*[ \t]*$", re.MULTILINE)
+
+
+def _clean(value):
+    if isinstance(value, (list, tuple)):
+        value = ", ".join(str(item).strip() for item in value)
+    if not isinstance(value, str):
+        return ""
+    return value.strip().strip("\"'`").strip()
+
+
+def _parse_json(text):
+    start = text.find("{")
+    end = text.rfind("}")
+    if start < 0 or end <= start:
+        return None
+    try:
+        data = json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    sections = {}
+    for key, value in data.items():
+        match = re.fullmatch(r"(positive|negative)(?:[ _]?prompts?)?", str(key).strip(), re.IGNORECASE)
+        if match:
+            sections[match.group(1).lower()] = _clean(value)
+    return sections
+
+
+def _parse_sections(text):
+    headers = list(_SECTION_HEADER.finditer(text))
+    sections = {}
+    for header, following in zip(headers, headers[1:] + [None]):
+        name = header.group(1).lower()
+        # The first occurrence wins, models sometimes repeat a header in their closing remarks
+        if name not in sections:
+            sections[name] = _clean(text[header.end():following.start() if following else len(text)])
+    return sections
+
+
+def parse_combined_answer(text):
+    """
+        Extracts `(positive, negative)` from a combined Artbot answer, either a json object with "positive" and
+        "negative" keys or text sections starting with "POSITIVE:" and "NEGATIVE:" lines (markdown headers and
+        code fences are tolerated). Returns None when one of them is missing or empty.
+    """
+    if not isinstance(text, str):
+        return None
+    text = _CODE_FENCE.sub("", text)
+    for parse in (_parse_json, _parse_sections):
+        sections = parse(text)
+        if sections and sections.get("positive") and sections.get("negative"):
+            return sections["positive"], sections["negative"]
+    return None
@@ -0,0 +1,81 @@
+"""
+Import time benchmark of the suite registration.
+
+Imports the package in fresh interpreters, like comfyui does when it loads custom nodes, and reports
+the import time, the heavy modules the import pulled in (there should be none) and the slowest modules
+according to python's -X importtime.
+
+Usage:
+    python benchmarks/bench_import.py [--runs 10] [--preload torch] [--top 10]
+
+--preload imports modules before the suite (comfyui has already imported torch when it loads custom nodes),
+so only the cost of the suite itself is measured.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["torch", "torchvision", "comfy", "lollms_client", "requests", "numpy"]
+
+PROBE = """
+import importlib, json, sys, time
+for name in {preload!r}:
+    importlib.import_module(name)
+before = set(sys.modules)
+sys.path.insert(0, {parent!r})
+start = time.perf_counter()
+importlib.import_module({package!r})
+elapsed = time.perf_counter() - start
+loaded = sorted({{name.split(".")[0] for name in set(sys.modules) - before}} & set({heavy!r}))
+print(json.dumps({{"seconds": elapsed, "heavy": loaded}}))
+"""
+
+
+def probe(preload, importtime=False):
+    code = PROBE.format(preload=preload, parent=os.path.dirname(PACKAGE_DIR), package=os.path.basename(PACKAGE_DIR), heavy=HEAVY_MODULES)
+    command = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", code]
+    result = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1]), result.stderr
+
+
+def slowest_modules(importtime_output, top):
+    package = os.path.basename(PACKAGE_DIR)
+    rows = []
+    for line in importtime_output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = [part.strip() for part in line[len("import time:"):].split("|")]
+        rows.append((int(self_us), int(cumulative_us), name))
+    # Only keep what the suite import triggered, the preloaded modules are already in sys.modules
+    start = next((index for index, row in enumerate(rows) if row[2].startswith(package)), 0)
+    return sorted(rows[start:], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--preload", action="append", default=[])
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    timings = []
+    heavy = set()
+    for _ in range(args.runs):
+        result, _ = probe(args.preload)
+        timings.append(result["seconds"] * 1000)
+        heavy.update(result["heavy"])
+    print(f"suite import over {args.runs} runs: median {statistics.median(timings):.1f} ms, min {min(timings):.1f} ms, max {max(timings):.1f} ms")
+    print(f"heavy modules imported at registration: {', '.join(sorted(heavy)) or 'none'}")
+
+    _, importtime_output = probe(args.preload, importtime=True)
+    print(f"slowest modules (self / cumulative us):")
+    for self_us, cumulative_us, name in slowest_modules(importtime_output, args.top):
+        print(f"{self_us:>10} {cumulative_us:>12}  {name}")
+
+
+if __name__ == "__main__":
+    main()
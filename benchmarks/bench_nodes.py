@@ -0,0 +1,201 @@
+"""
+End to end benchmark of the suite nodes, without comfyui, models or a live lollms.
+
+The nodes talk to a local stand-in lollms server (see mock_lollms.py) with a configurable latency and
+token rate, and use fake CLIP/VAE objects producing tensors of the real shapes, so what is measured is the
+overhead of the suite itself plus the simulated LLM time. Each scenario runs in a fresh process and reports
+latency percentiles, throughput and the peak resident memory of its process.
+
+Scenarios:
+    artbot_text      Artbot positive + negative prompt generation, empty latent
+    artbot_combined  artbot_text with the positive and negative prompts asked in a single request
+    artbot_img2img   Artbot with an input image encoded through the VAE
+    text_gen         Lollms_Text_Gen
+    text_saver       Lollms_Text_Saver, synchronous jsonl writes
+    text_saver_async Lollms_Text_Saver, writes queued to the background writer (flushed at the end)
+    randomize_video  RandomizeVideo noise latents
+
+Usage:
+    python benchmarks/bench_nodes.py [--scenarios artbot_text,text_gen] [--iterations 50] [--concurrency 4]
+                                     [--latency 0.2] [--token-rate 200] [--json results.json]
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+PACKAGE_DIR = os.path.dirname(BENCHMARKS_DIR)
+sys.path.insert(0, BENCHMARKS_DIR)
+
+
+def load_suite():
+    """
+        Imports the suite as a package, like comfyui does, with fake comfy modules when comfyui is not available.
+    """
+    from fakes import install_fake_comfy
+    install_fake_comfy()
+    sys.path.insert(0, os.path.dirname(PACKAGE_DIR))
+    return importlib.import_module(os.path.basename(PACKAGE_DIR)).NODE_CLASS_MAPPINGS
+
+
+def artbot_text(nodes, host, args):
+    from fakes import FakeClip
+    node, clip = nodes["Artbot"](), FakeClip()
+    def run(index):
+        node.build_prompt(clip, host, "YES", args.width, args.height, args.batch_size, f"a watercolor cat number {index}", cache="off")
+    return run, None
+
+
+def artbot_combined(nodes, host, args):
+    from fakes import FakeClip
+    node, clip = nodes["Artbot"](), FakeClip()
+    def run(index):
+        node.build_prompt(clip, host, "YES", args.width, args.height, args.batch_size, f"a watercolor cat number {index}", prompt_requests="COMBINED", cache="off")
+    return run, None
+
+
+def artbot_img2img(nodes, host, args):
+    import torch
+    from fakes import FakeClip, FakeVae
+    node, clip, vae = nodes["Artbot"](), FakeClip(), FakeVae()
+    input_image = torch.rand(1, args.image_height, args.image_width, 3)
+    def run(index):
+        node.build_prompt(clip, host, "USE_DEFAULT", args.width, args.height, args.batch_size, f"a watercolor cat number {index}", input_image=input_image, vae=vae, cache="off")
+    return run, None
+
+
+def text_gen(nodes, host, args):
+    node = nodes["Lollms_Text_Gen"]()
+    def run(index):
+        node.build_prompt(host, "Summarize the following text", f"document number {index}", cache="off")
+    return run, None
+
+
+def text_saver(nodes, host, args, asynchronous="NO"):
+    node = nodes["Lollms_Text_Saver"]()
+    folder = tempfile.mkdtemp(prefix="lollms_bench_")
+    text = "lorem ipsum " * 100
+    def run(index):
+        node.save_text(text, os.path.join(folder, f"out_{index % 8}.jsonl"), mode="jsonl", asynchronous=asynchronous, prompt=f"prompt {index}")
+    def finish():
+        if asynchronous == "YES":
+            importlib.import_module(f"{os.path.basename(PACKAGE_DIR)}.text_gen.text_writer").get_text_writer().flush()
+    return run, finish
+
+
+def text_saver_async(nodes, host, args):
+    return text_saver(nodes, host, args, asynchronous="YES")
+
+
+def randomize_video(nodes, host, args):
+    import torch
+    node = nodes["RandomizeVideo"]()
+    frames = torch.zeros(args.frames, args.height, args.width, 3)
+    def run(index):
+        node.generate_random_images(frames, seed=index, keyframe_interval=4)
+    return run, None
+
+
+SCENARIOS = {
+    "artbot_text": artbot_text,
+    "artbot_combined": artbot_combined,
+    "artbot_img2img": artbot_img2img,
+    "text_gen": text_gen,
+    "text_saver": text_saver,
+    "text_saver_async": text_saver_async,
+    "randomize_video": randomize_video,
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def run_scenario(name, args, queue):
+    from mock_lollms import MockLollmsServer
+    server = MockLollmsServer(latency=args.latency, token_rate=args.token_rate, answer_tokens=args.answer_tokens).start()
+    nodes = load_suite()
+    run, finish = SCENARIOS[name](nodes, server.address, args)
+    for index in range(args.warmup):
+        run(-1 - index)
+
+    def timed(index):
+        start = time.perf_counter()
+        run(index)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        latencies = list(executor.map(timed, range(args.iterations)))
+    if finish is not None:
+        finish()
+    wall = time.perf_counter() - start
+    server.shutdown()
+    # ru_maxrss is in kilobytes on linux and bytes on macos
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+    queue.put({
+        "scenario": name,
+        "iterations": args.iterations,
+        "concurrency": args.concurrency,
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p90_ms": percentile(latencies, 0.9) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.mean(latencies) * 1000,
+        "throughput": args.iterations / wall,
+        "peak_mb": peak_mb,
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma separated scenarios to run")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=1, help="node executions running at the same time")
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.05, help="mock lollms seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=2000.0, help="mock lollms tokens per second")
+    parser.add_argument("--answer-tokens", type=int, default=60)
+    parser.add_argument("--width", type=int, default=1024)
+    parser.add_argument("--height", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--image-width", type=int, default=1920, help="input image width of artbot_img2img")
+    parser.add_argument("--image-height", type=int, default=1080, help="input image height of artbot_img2img")
+    parser.add_argument("--frames", type=int, default=16, help="frames of randomize_video")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios {', '.join(unknown)}, expected some of {', '.join(SCENARIOS)}")
+
+    context = multiprocessing.get_context("spawn")
+    print(f"latency={args.latency}s token_rate={args.token_rate}/s answer_tokens={args.answer_tokens} concurrency={args.concurrency}")
+    print(f"{'scenario':>16} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'ops/s':>8} {'peak MB':>8}")
+    results = []
+    for name in names:
+        queue = context.Queue()
+        process = context.Process(target=run_scenario, args=(name, args, queue))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            sys.exit(f"scenario {name} failed")
+        result = queue.get()
+        results.append(result)
+        print(f"{name:>16} {result['p50_ms']:>9.1f} {result['p90_ms']:>9.1f} {result['p99_ms']:>9.1f} {result['throughput']:>8.1f} {result['peak_mb']:>8.0f}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
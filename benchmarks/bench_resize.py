@@ -0,0 +1,97 @@
+"""
+Benchmark of the Artbot input_image preprocessing.
+
+Compares the former per image torchvision loop (Resize + CenterCrop + torch.stack of the
+replicated list) with the batched `fit_and_center_crop` path, for several batch sizes and
+resolutions. Each case runs in a fresh process so the reported peak memory is its own.
+
+Usage:
+    python benchmarks/bench_resize.py [--device cpu|cuda] [--repeat 3]
+"""
+import argparse
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import torch
+from torchvision.transforms import Resize, CenterCrop
+
+from art_gen.image_ops import fit_and_center_crop
+
+TARGET_WIDTH = 1024
+TARGET_HEIGHT = 1024
+RESOLUTIONS = [(1080, 1920), (2160, 3840)]
+FRAMES = [1, 4]
+BATCH_SIZES = [1, 4, 16]
+
+
+def legacy_path(input_image, width, height, batch_size, device):
+    processed_images = []
+    for i in range(input_image.shape[0]):
+        img = input_image[i,...].permute(2, 0, 1)
+        orig_height, orig_width = img.shape[1], img.shape[2]
+        scale_factor = min(width / orig_width, height / orig_height)
+        resized_img = Resize((int(orig_height * scale_factor), int(orig_width * scale_factor)))(img)
+        cropped_img = CenterCrop((height, width))(resized_img)
+        processed_images.append(cropped_img.permute(1, 2, 0))
+    return torch.stack(processed_images*batch_size)
+
+
+def batched_path(input_image, width, height, batch_size, device):
+    processed_batch = fit_and_center_crop(input_image, width, height, device=device)
+    if batch_size > 1:
+        processed_batch = processed_batch.repeat(batch_size, 1, 1, 1)
+    return processed_batch
+
+
+def run_case(path_name, frames, resolution, batch_size, device, repeat, queue):
+    path = legacy_path if path_name == "legacy" else batched_path
+    input_image = torch.rand(frames, resolution[0], resolution[1], 3)
+    if device == "cuda":
+        torch.cuda.reset_peak_memory_stats()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = path(input_image, TARGET_WIDTH, TARGET_HEIGHT, batch_size, torch.device(device))
+        if device == "cuda":
+            torch.cuda.synchronize()
+        timings.append(time.perf_counter() - start)
+        del output
+    if device == "cuda":
+        peak_mb = torch.cuda.max_memory_allocated() / 2**20
+    else:
+        # ru_maxrss is in kilobytes on linux and bytes on macos
+        peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == "darwin" else 2**10)
+    queue.put((min(timings), peak_mb))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context("spawn")
+    print(f"device={args.device} target={TARGET_WIDTH}x{TARGET_HEIGHT}")
+    print(f"{'input':>16} {'batch':>5} {'legacy ms':>10} {'legacy MB':>10} {'batched ms':>11} {'batched MB':>11}")
+    for resolution in RESOLUTIONS:
+        for frames in FRAMES:
+            for batch_size in BATCH_SIZES:
+                results = []
+                for path_name in ("legacy", "batched"):
+                    queue = context.Queue()
+                    process = context.Process(target=run_case, args=(path_name, frames, resolution, batch_size, args.device, args.repeat, queue))
+                    process.start()
+                    results.append(queue.get())
+                    process.join()
+                (legacy_s, legacy_mb), (batched_s, batched_mb) = results
+                label = f"{frames}x{resolution[1]}x{resolution[0]}"
+                print(f"{label:>16} {batch_size:>5} {legacy_s*1000:>10.1f} {legacy_mb:>10.0f} {batched_s*1000:>11.1f} {batched_mb:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Lightweight stand-ins for the comfyui objects the nodes use, so the benchmarks run without comfyui,
+models or a GPU. They produce tensors of the real shapes but don't run any model.
+"""
+import sys
+import types
+
+import torch
+
+CLIP_CHUNK_TOKENS = 77
+
+
+class FakeClip:
+    """
+    Tokenizes by words (75 words per 77 tokens chunk) and returns random conditionings of the real shape.
+    """
+    def __init__(self, width=768):
+        self.width = width
+        self.encodes = 0
+
+    def tokenize(self, text):
+        chunks = max(1, (len(text.split()) + 74) // 75)
+        return {"l": [[(0, 1.0)] * CLIP_CHUNK_TOKENS for _ in range(chunks)]}
+
+    def encode_from_tokens(self, tokens, return_pooled=False):
+        self.encodes += 1
+        chunks = len(tokens["l"])
+        cond = torch.randn(1, CLIP_CHUNK_TOKENS * chunks, self.width)
+        if return_pooled:
+            return cond, torch.randn(1, self.width)
+        return cond
+
+
+class FakeVae:
+    """
+    Encodes [B, H, W, C] images to zero [B, 4, H/8, W/8] latents.
+    """
+    def __init__(self):
+        self.frames = 0
+
+    def encode(self, pixels):
+        self.frames += pixels.shape[0]
+        return torch.zeros(pixels.shape[0], 4, pixels.shape[1] // 8, pixels.shape[2] // 8)
+
+
+class FakeProgressBar:
+    def __init__(self, total):
+        self.total = total
+        self.current = 0
+
+    def update(self, value):
+        self.current += value
+
+    def update_absolute(self, value, total=None, preview=None):
+        self.current = value
+
+
+def install_fake_comfy():
+    """
+        Registers minimal `comfy.model_management` and `comfy.utils` modules when comfyui is not importable.
+        Returns True when the fakes were installed.
+    """
+    try:
+        import comfy.model_management  # noqa: F401
+        import comfy.utils  # noqa: F401
+        return False
+    except ImportError:
+        pass
+    comfy = types.ModuleType("comfy")
+    model_management = types.ModuleType("comfy.model_management")
+    model_management.intermediate_device = lambda: torch.device("cpu")
+    model_management.get_torch_device = lambda: torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    utils = types.ModuleType("comfy.utils")
+    utils.ProgressBar = FakeProgressBar
+    comfy.model_management = model_management
+    comfy.utils = utils
+    sys.modules.update({"comfy": comfy, "comfy.model_management": model_management, "comfy.utils": utils})
+    return True
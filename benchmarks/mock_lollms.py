@@ -0,0 +1,103 @@
+"""
+Stand-in lollms server for the benchmarks.
+
+Answers `/lollms_generate` like lollms does (a json encoded string, or a chunked stream when "stream" is set)
+after a configurable latency, producing the answer at a configurable token rate. Answers are derived from the
+prompt so different prompts get different answers. `GET /` answers the health checks.
+
+Usage:
+    python benchmarks/mock_lollms.py [--port 9600] [--latency 0.2] [--token-rate 50] [--answer-tokens 60]
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_answer(prompt, tokens):
+    seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    answer = [f"{seed[i % 56:i % 56 + 8]} " for i in range(tokens)]
+    if "NEGATIVE:" in prompt:
+        # Combined Artbot requests get both sections
+        half = max(1, tokens // 2)
+        answer = ["POSITIVE: "] + answer[:half] + ["\nNEGATIVE: "] + answer[half:]
+    return answer
+
+
+class MockLollmsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._send(200, b'"ok"')
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/lollms_generate":
+            self._send(404, b'"not found"')
+            return
+        data = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        tokens = make_answer(data.get("prompt", ""), min(server.answer_tokens, data.get("n_predict") or server.answer_tokens))
+        time.sleep(server.latency)
+        if not data.get("stream"):
+            time.sleep(len(tokens) / server.token_rate)
+            self._send(200, json.dumps("".join(tokens)).encode("utf-8"))
+            return
+        self.send_response(200)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for token in tokens:
+                time.sleep(1 / server.token_rate)
+                chunk = token.encode("utf-8")
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped the generation
+            pass
+
+
+class MockLollmsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.2, token_rate=50.0, answer_tokens=60):
+        super().__init__(("127.0.0.1", port), MockLollmsHandler)
+        self.latency = latency
+        self.token_rate = token_rate
+        self.answer_tokens = answer_tokens
+
+    @property
+    def address(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name="mock_lollms", daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=9600)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds before the first token")
+    parser.add_argument("--token-rate", type=float, default=50.0, help="generated tokens per second")
+    parser.add_argument("--answer-tokens", type=int, default=60, help="tokens per answer, capped by n_predict")
+    args = parser.parse_args()
+    server = MockLollmsServer(args.port, args.latency, args.token_rate, args.answer_tokens)
+    print(f"mock lollms listening on {server.address}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
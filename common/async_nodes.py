@@ -0,0 +1,20 @@
+import inspect
+import os
+import sys
+
+
+def comfy_supports_async_nodes():
+    """
+        Tells whether the running comfyui awaits coroutine node functions, so the LLM backed nodes can
+        expose an async entry point that doesn't hold the execution while lollms generates.
+
+        LOLLMS_NODES_ASYNC forces the choice: "on", "off" or "auto" (default, detected from comfyui's
+        execution module, which is already loaded when comfyui imports the custom nodes).
+    """
+    mode = os.environ.get("LOLLMS_NODES_ASYNC", "auto").lower()
+    if mode in ("on", "off"):
+        return mode == "on"
+    execution = sys.modules.get("execution")
+    if execution is None:
+        return False
+    return any(inspect.iscoroutinefunction(getattr(execution, name, None)) for name in ("get_output_data", "_async_map_node_over_list"))
@@ -0,0 +1,38 @@
+import hashlib
+
+ALWAYS_CHANGED = float("nan")
+
+
+def _update(digest, value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        digest.update(repr(value).encode("utf-8"))
+    elif isinstance(value, dict):
+        digest.update(b"{")
+        for key in sorted(value, key=str):
+            _update(digest, key)
+            _update(digest, value[key])
+        digest.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"[")
+        for item in value:
+            _update(digest, item)
+        digest.update(b"]")
+    elif hasattr(value, "shape") and hasattr(value, "detach"):
+        # Tensors are identified by their storage and version counter instead of their content, copying a video
+        # batch to the cpu on every queue costs more than running the node. A tensor coming from a re executed
+        # node is a new tensor, and comfyui re executes the downstream nodes of a changed node anyway.
+        digest.update(f"tensor{tuple(value.shape)}{value.dtype}{value.device}@{id(value)}:{value.data_ptr()}:{value._version}".encode("utf-8"))
+    else:
+        # Models (CLIP, VAE...) are identified by the loaded object
+        digest.update(f"{type(value).__name__}@{id(value)}".encode("utf-8"))
+
+
+def hash_inputs(**inputs):
+    """
+        Returns a stable hash of node inputs, used as IS_CHANGED value.
+    """
+    digest = hashlib.sha256()
+    for name in sorted(inputs):
+        _update(digest, name)
+        _update(digest, inputs[name])
+    return digest.hexdigest()
@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+
+from .metrics import get_metrics
+
+
+class LollmsError(RuntimeError):
+    """
+    Raised when a lollms server answers a generation request with an error status.
+    """
+    def __init__(self, host, status_code, body):
+        self.host = host
+        self.status_code = status_code
+        self.body = body
+        super().__init__(f"lollms server {host} answered with status {status_code}: {body[:500]}")
+
+
+class LollmsHttpClient:
+    """
+    A lollms client bound to one host that keeps its connections alive between requests.
+
+    It speaks the same `/lollms_generate` protocol as `lollms_client.LollmsClient` but goes
+    through a pooled `requests.Session`, so consecutive prompts reuse the TCP/TLS connection.
+
+    Attributes
+    ----------
+    host_address (`str`):
+        Base address of the lollms server.
+    connect_timeout (`float`):
+        Seconds allowed to open a connection.
+    read_timeout (`float`):
+        Seconds allowed between two bytes of the answer, generation can be slow so this is large.
+    max_retries (`int`):
+        Retries on connection errors and 502/503/504 answers.
+    backoff_factor (`float`):
+        Exponential backoff between retries: backoff_factor * 2 ** (retry - 1) seconds.
+    pool_maxsize (`int`):
+        Maximum number of kept alive connections to the host.
+    """
+    def __init__(self, host_address, connect_timeout=5.0, read_timeout=300.0, max_retries=3, backoff_factor=0.5, pool_maxsize=16):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        class CountingRetry(Retry):
+            def increment(self, *args, **kwargs):
+                # Raises once the retries are exhausted, so only actual retries are counted
+                retry = super().increment(*args, **kwargs)
+                get_metrics().increment("lollms_retries", kind="http", host=host_address.rstrip("/"))
+                return retry
+
+        self.host_address = host_address.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        retry = CountingRetry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset({"GET", "POST"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _payload(self, prompt, stream, model_name=None, personality=-1, n_predict=1024, temperature=0.1, top_k=50, top_p=0.95, repeat_penalty=0.8, repeat_last_n=40, seed=None, n_threads=8):
+        return {
+            "prompt": prompt,
+            "model_name": model_name,
+            "personality": personality,
+            "n_predict": n_predict,
+            "stream": stream,
+            "temperature": temperature,
+            "top_k": top_k,
+            "top_p": top_p,
+            "repeat_penalty": repeat_penalty,
+            "repeat_last_n": repeat_last_n,
+            "seed": seed,
+            "n_threads": n_threads
+        }
+
+    def generate_text(self, prompt, **params):
+        data = self._payload(prompt, False, **params)
+        response = self.session.post(f"{self.host_address}/lollms_generate", json=data, timeout=self.timeout)
+        if response.status_code != 200:
+            raise LollmsError(self.host_address, response.status_code, response.text)
+        return unquote(response.text)
+
+    def generate_text_stream(self, prompt, streaming_callback, **params):
+        """
+            Generates text while it is streamed by the server.
+            `streaming_callback(chunk)` is called for every received chunk, if it returns False the chunk
+            is dropped and the generation is stopped by closing the connection.
+        """
+        data = self._payload(prompt, True, **params)
+        text = ""
+        with self.session.post(f"{self.host_address}/lollms_generate", json=data, timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                raise LollmsError(self.host_address, response.status_code, response.text)
+            response.encoding = "utf-8"
+            for chunk in response.iter_content(chunk_size=None, decode_unicode=True):
+                if not chunk:
+                    continue
+                if streaming_callback(chunk) is False:
+                    break
+                text += chunk
+        return text
+
+    def ping(self):
+        """
+            Returns True when the server answers at all, used by the active health checks.
+            It bypasses the retrying session so a dead host is reported at once.
+        """
+        import requests
+        response = requests.get(self.host_address, timeout=self.timeout[0])
+        return response.status_code < 500
+
+    def close(self):
+        self.session.close()
+
+
+def unquote(text):
+    # lollms answers with a json encoded string
+    text = text.strip()
+    if len(text) >= 2 and text.startswith('"') and text.endswith('"'):
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text[1:-1]
+    return text
+
+
+_client_settings = {
+    "connect_timeout": float(os.environ.get("LOLLMS_NODES_CONNECT_TIMEOUT", 5)),
+    "read_timeout": float(os.environ.get("LOLLMS_NODES_READ_TIMEOUT", 300)),
+    "max_retries": int(os.environ.get("LOLLMS_NODES_MAX_RETRIES", 3)),
+    "backoff_factor": float(os.environ.get("LOLLMS_NODES_RETRY_BACKOFF", 0.5)),
+    "pool_maxsize": int(os.environ.get("LOLLMS_NODES_POOL_SIZE", 16)),
+}
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(lollms_host):
+    """
+        Returns the shared client of a host, creating it on first use.
+        Every node of the suite goes through this registry so connections are shared between nodes.
+    """
+    key = lollms_host.rstrip("/")
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = LollmsHttpClient(key, **_client_settings)
+            _clients[key] = client
+        return client
+
+def configure_clients(**settings):
+    """
+        Changes the settings used to build clients (connect_timeout, read_timeout, max_retries,
+        backoff_factor, pool_maxsize). Existing clients are closed and rebuilt on next use.
+    """
+    unknown = set(settings) - set(_client_settings)
+    if unknown:
+        raise ValueError(f"Unknown client settings: {', '.join(sorted(unknown))}")
+    with _clients_lock:
+        _client_settings.update(settings)
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
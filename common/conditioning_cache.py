@@ -0,0 +1,140 @@
+import os
+import threading
+import weakref
+from collections import OrderedDict
+
+from .metrics import get_metrics
+
+
+def tensor_bytes(tensor):
+    return tensor.element_size() * tensor.nelement() if tensor is not None else 0
+
+
+class ConditioningCache:
+    """
+    LRU cache of CLIP `(cond, pooled)` encodings keyed by the CLIP model identity and the exact prompt text.
+
+    The model identity is the encoder object plus its patches (loras) and clip skip layer, so a patched
+    clip never reuses the encodings of the bare model. Entries of a model are dropped once the model object
+    is garbage collected (offloading a model from the GPU doesn't free the object).
+
+    Attributes
+    ----------
+    max_bytes (`int`):
+        Memory budget of the cached tensors, least recently used entries are evicted past it.
+    """
+    def __init__(self, max_bytes=256*1024*1024):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._finalizers = {}
+        self._collected = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def model_key(clip):
+        model = getattr(clip, "cond_stage_model", clip)
+        patcher = getattr(clip, "patcher", None)
+        return (id(model), str(getattr(patcher, "patches_uuid", None)), getattr(clip, "layer_idx", None))
+
+    def _watch(self, clip):
+        model = getattr(clip, "cond_stage_model", clip)
+        model_id = id(model)
+        if model_id not in self._finalizers:
+            try:
+                self._finalizers[model_id] = weakref.finalize(model, self._collected.append, model_id)
+            except TypeError:
+                # Objects that can't be weakly referenced are simply never watched
+                self._finalizers[model_id] = None
+
+    def drop_model(self, model_id):
+        with self._lock:
+            self._collected.append(model_id)
+            self._drop_collected()
+
+    def _drop_collected(self):
+        # Finalizers may run during a garbage collection on a thread holding the lock, so they only queue
+        # the model ids and the entries are dropped here, with the lock held, before the next lookup
+        while self._collected:
+            model_id = self._collected.pop()
+            for key in [key for key in self._entries if key[0][0] == model_id]:
+                self._discard(key)
+            self._finalizers.pop(model_id, None)
+
+    def _discard(self, key):
+        _, _, size = self._entries.pop(key)
+        self.used_bytes -= size
+
+    def get(self, clip, text):
+        key = (self.model_key(clip), text)
+        with self._lock:
+            self._drop_collected()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1]
+
+    def put(self, clip, text, cond, pooled):
+        size = tensor_bytes(cond) + tensor_bytes(pooled)
+        if size > self.max_bytes:
+            return
+        key = (self.model_key(clip), text)
+        with self._lock:
+            self._drop_collected()
+            self._watch(clip)
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (cond, pooled, size)
+            self.used_bytes += size
+            while self.used_bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def encode(self, clip, text):
+        """
+            Returns the `(cond, pooled)` encoding of the text, from the cache when possible.
+        """
+        metrics = get_metrics()
+        cached = self.get(clip, text)
+        metrics.increment("conditioning_cache", result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+        with metrics.span("tokenize"):
+            tokens = clip.tokenize(text)
+        with metrics.span("encode"):
+            cond, pooled = clip.encode_from_tokens(tokens, return_pooled=True)
+        self.put(clip, text, cond, pooled)
+        return cond, pooled
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.used_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "used_bytes": self.used_bytes,
+            }
+
+
+_conditioning_cache = None
+_conditioning_cache_lock = threading.Lock()
+
+def get_conditioning_cache():
+    """
+        Returns the process wide conditioning cache.
+        Its memory budget is set with the LOLLMS_NODES_COND_CACHE_MB environment variable (default 256, 0 disables it).
+    """
+    global _conditioning_cache
+    with _conditioning_cache_lock:
+        if _conditioning_cache is None:
+            _conditioning_cache = ConditioningCache(int(float(os.environ.get("LOLLMS_NODES_COND_CACHE_MB", 256))*1024*1024))
+        return _conditioning_cache
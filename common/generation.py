@@ -0,0 +1,118 @@
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .load_balancer import get_balancer
+from .metrics import get_metrics
+from .response_cache import get_response_cache
+from .single_flight import SingleFlight
+
+# Identical prompts sent while one is already being generated wait for it instead of hitting lollms again
+_in_flight = SingleFlight()
+
+
+def generate_text(lollms_host, full_prompt, cache="on", streaming_callback=None, cache_tag=None, priority="interactive", **params):
+    """
+        Shared text generation path of the lollms nodes.
+
+        lollms_host:
+            A host address, several addresses separated by commas or `pool:<name>`, requests are then balanced
+            between the hosts and retried on another one when a host fails (see common/load_balancer.py).
+
+        cache:
+            - "on": return a cached response if there is one, otherwise generate and store it
+            - "off": always generate, the cache is neither read nor written
+            - "refresh": always generate and overwrite the cached response
+            With "on" and "refresh", concurrent identical requests share a single call to lollms.
+        streaming_callback:
+            When set, the answer is streamed and the callback receives every chunk, returning False stops the generation.
+        cache_tag:
+            Extra value added to the cache key, used when a callback may cut the answer so that answers
+            cut with different criteria are not mixed up.
+        priority:
+            "interactive" or "batch", interactive requests are sent to lollms before the batch ones waiting for the
+            same host (see common/scheduler.py).
+    """
+    balancer = get_balancer(lollms_host)
+    metrics = get_metrics()
+    def call():
+        with metrics.span("llm"):
+            return request()
+    def request():
+        if streaming_callback is None:
+            return balancer.run(lambda client: client.generate_text(full_prompt, **params), priority=priority)
+        # Once chunks reached the callback, retrying on another host would feed it a second answer
+        received = []
+        def tracked_callback(chunk):
+            received.append(True)
+            return streaming_callback(chunk)
+        return balancer.run(
+            lambda client: client.generate_text_stream(full_prompt, tracked_callback, **params),
+            retryable=lambda: not received,
+            priority=priority
+        )
+
+    if cache == "off":
+        return call()
+
+    response_cache = get_response_cache()
+    key = response_cache.make_key(lollms_host, full_prompt, dict(params, cache_tag=cache_tag) if cache_tag is not None else params)
+    if cache == "on":
+        answer = response_cache.get(key)
+        metrics.increment("response_cache", result="miss" if answer is None else "hit")
+        if answer is not None:
+            return answer
+
+    def call_and_store():
+        answer = call()
+        response_cache.put(key, answer)
+        return answer
+    # Requests waiting on another one don't see its chunks, their streaming callbacks are not called
+    return _in_flight.do(key, call_and_store)
+
+
+def _timed_generate(lollms_host, prompts, index, cache, streaming_callbacks, cache_tag, priority, params):
+    start = time.perf_counter()
+    callback = streaming_callbacks[index] if streaming_callbacks else None
+    answer = generate_text(lollms_host, prompts[index], cache=cache, streaming_callback=callback, cache_tag=cache_tag, priority=priority, **params)
+    return index, answer, time.perf_counter() - start
+
+
+def submit_generations(lollms_host, prompts, cache="on", max_workers=4, streaming_callbacks=None, cache_tag=None, priority="interactive", **params):
+    """
+        Starts generating the answers of several prompts in background threads and returns at once with
+        one future per prompt, resolving to `(index, answer, seconds)`. The caller can do other work while
+        lollms generates, then wait for the futures (or wrap them with asyncio.wrap_future).
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(prompts))), thread_name_prefix="lollms_generate")
+    # The workers run in the caller's context so their spans are attributed to the calling node
+    futures = [executor.submit(contextvars.copy_context().run, _timed_generate, lollms_host, prompts, index, cache, streaming_callbacks, cache_tag, priority, params) for index in range(len(prompts))]
+    # The submitted generations still run, the threads exit once they are done
+    executor.shutdown(wait=False)
+    return futures
+
+
+def generate_as_completed(lollms_host, prompts, cache="on", max_workers=4, streaming_callbacks=None, cache_tag=None, priority="interactive", **params):
+    """
+        Generates the answers of several prompts concurrently through a bounded thread pool.
+        Yields `(index, answer, seconds)` tuples in completion order so the caller can start
+        working on the first answers while the others are still being generated.
+        `streaming_callbacks` is an optional list with one streaming callback per prompt.
+    """
+    if len(prompts) == 1:
+        yield _timed_generate(lollms_host, prompts, 0, cache, streaming_callbacks, cache_tag, priority, params)
+        return
+    futures = submit_generations(lollms_host, prompts, cache, max_workers, streaming_callbacks, cache_tag, priority, **params)
+    for future in as_completed(futures):
+        yield future.result()
+
+
+def generate_many(lollms_host, prompts, cache="on", max_workers=4, **params):
+    """
+        Generates the answers of several prompts concurrently through a bounded thread pool.
+        Answers are returned in the same order as the prompts.
+    """
+    answers = [None] * len(prompts)
+    for index, answer, _ in generate_as_completed(lollms_host, prompts, cache=cache, max_workers=max_workers, **params):
+        answers[index] = answer
+    return answers
@@ -0,0 +1,63 @@
+LATENT_DTYPES = ["float32", "float16", "bfloat16"]
+# BROADCAST returns a batch that is an expanded view of one frame, it only takes the memory of one frame
+# until something writes to it (samplers add noise out of place, so they get a full tensor only then)
+LATENT_ALLOCATIONS = ["MATERIALIZED", "BROADCAST"]
+
+_DTYPE_SIZES = {"float32": 4, "float16": 2, "bfloat16": 2}
+
+
+def torch_dtype(name):
+    import torch
+    if name not in LATENT_DTYPES:
+        raise ValueError(f"Unknown latent dtype {name}, expected one of {', '.join(LATENT_DTYPES)}")
+    return getattr(torch, name)
+
+
+def tensor_nbytes(shape, dtype="float32"):
+    count = 1
+    for size in shape:
+        count *= size
+    return count * _DTYPE_SIZES[dtype]
+
+
+def format_bytes(size):
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.1f} {unit}" if unit != "B" else f"{size} B"
+        size /= 1024
+
+
+def ensure_memory_available(required, device, what, hint=""):
+    """
+        Raises a ValueError when `required` bytes don't fit in the free memory of the device, so an impossible
+        request fails at once with an explanation instead of running the worker out of memory.
+        Nothing is checked when comfyui can't tell the free memory.
+    """
+    import comfy.model_management
+    get_free_memory = getattr(comfy.model_management, "get_free_memory", None)
+    if get_free_memory is None:
+        return
+    free = get_free_memory(device)
+    if required > free:
+        raise ValueError(f"{what} needs {format_bytes(required)} on {device} but only {format_bytes(free)} are free.{' ' + hint if hint else ''}")
+
+
+def empty_latent(frames, height, width, device, dtype="float32", allocation="MATERIALIZED", channels=4):
+    """
+        Returns a `[frames, channels, height, width]` zero latent, as an expanded view of one frame with BROADCAST.
+    """
+    import torch
+    if allocation == "BROADCAST":
+        return torch.zeros([1, channels, height, width], device=device, dtype=torch_dtype(dtype)).expand(frames, -1, -1, -1)
+    return torch.zeros([frames, channels, height, width], device=device, dtype=torch_dtype(dtype))
+
+
+def replicate_latent(latent, repeats, allocation="MATERIALIZED"):
+    """
+        Repeats a latent batch, a single frame is only expanded with BROADCAST.
+    """
+    if repeats <= 1:
+        return latent
+    if allocation == "BROADCAST" and latent.shape[0] == 1:
+        return latent.expand(repeats, -1, -1, -1)
+    return latent.repeat(repeats, 1, 1, 1)
@@ -0,0 +1,228 @@
+import itertools
+import json
+import os
+import re
+import threading
+import time
+
+from .client_pool import LollmsError, get_client
+from .metrics import get_metrics, get_logger
+from .scheduler import get_scheduler
+
+logger = get_logger("load_balancer")
+
+BALANCING_STRATEGIES = ["least_outstanding", "round_robin"]
+
+
+class HostState:
+    """
+    Health bookkeeping of one lollms host.
+
+    The circuit is closed while the host answers. After `failure_threshold` consecutive failures it opens and the
+    host is skipped for `cooldown` seconds, then a single trial request (half open) decides whether it closes again.
+    """
+    def __init__(self, host, failure_threshold=3, cooldown=30.0):
+        self.host = host
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.outstanding = 0
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.total_requests = 0
+        self.total_failures = 0
+
+    def available(self, now):
+        if self.opened_at is None:
+            return True
+        return now - self.opened_at >= self.cooldown and not self.trial_running
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self, now):
+        self.failures += 1
+        self.total_failures += 1
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = now
+
+
+class LoadBalancer:
+    """
+    Client side balancer over several lollms hosts.
+
+    Requests go to the available host with the fewest outstanding requests (or round robin), a failing request
+    is transparently retried on another host, and hosts failing repeatedly are taken out of rotation by a circuit
+    breaker. Failures are detected passively from the requests themselves and, when `health_interval` is set,
+    actively by a background thread probing every host.
+
+    Attributes
+    ----------
+    hosts (`list`):
+        Base addresses of the lollms servers.
+    strategy (`str`):
+        "least_outstanding" or "round_robin".
+    """
+    def __init__(self, hosts, strategy="least_outstanding", failure_threshold=3, cooldown=30.0, health_interval=0.0):
+        if strategy not in BALANCING_STRATEGIES:
+            raise ValueError(f"Unknown balancing strategy {strategy}, expected one of {', '.join(BALANCING_STRATEGIES)}")
+        self.hosts = hosts
+        self.strategy = strategy
+        self.states = [HostState(host, failure_threshold, cooldown) for host in hosts]
+        self._cursor = itertools.count()
+        self._lock = threading.Lock()
+        self._health_thread = None
+        if health_interval and len(hosts) > 1:
+            self._health_thread = threading.Thread(target=self._health_loop, args=(health_interval,), name="lollms_health_check", daemon=True)
+            self._health_thread.start()
+
+    def _acquire(self, excluded):
+        now = time.monotonic()
+        with self._lock:
+            candidates = [state for state in self.states if state not in excluded]
+            if not candidates:
+                return None
+            available = [state for state in candidates if state.available(now)]
+            if not available:
+                # Every remaining host is broken, probe the one that failed first rather than failing outright
+                available = [min(candidates, key=lambda state: state.opened_at or 0)]
+            offset = next(self._cursor)
+            rotated = available[offset % len(available):] + available[:offset % len(available)]
+            if self.strategy == "least_outstanding":
+                state = min(rotated, key=lambda state: state.outstanding)
+            else:
+                state = rotated[0]
+            if state.opened_at is not None:
+                state.trial_running = True
+            state.outstanding += 1
+            state.total_requests += 1
+            return state
+
+    def _release(self, state, success):
+        with self._lock:
+            state.outstanding -= 1
+            state.trial_running = False
+            if success:
+                state.record_success()
+            else:
+                self._record_failure(state)
+
+    def _record_failure(self, state):
+        was_open = state.opened_at is not None
+        state.record_failure(time.monotonic())
+        if not was_open and state.opened_at is not None:
+            get_metrics().increment("circuit_opened", host=state.host)
+            logger.warning("lollms host %s failed %d times in a row, leaving it out for %.0f s", state.host, state.failures, state.cooldown)
+
+    def run(self, request, retryable=None, priority="interactive"):
+        """
+            Runs `request(client)` on a host, retrying on the other hosts when it raises, except for the 4xx errors
+            that would fail the same way everywhere. `retryable()` can veto a retry, for instance once a stream was
+            partially consumed. The last error is raised when every host failed.
+            The request waits for its turn in the scheduler of the host (see common/scheduler.py) with the given priority.
+        """
+        tried = []
+        last_error = None
+        while True:
+            state = self._acquire(tried)
+            if state is None:
+                break
+            if tried:
+                get_metrics().increment("lollms_retries", kind="failover", host=tried[-1].host)
+            tried.append(state)
+            try:
+                with get_scheduler(state.host).slot(priority):
+                    result = request(get_client(state.host))
+            except LollmsError as ex:
+                if ex.status_code < 500:
+                    # The host works, the request itself is rejected
+                    self._release(state, True)
+                    raise
+                self._release(state, False)
+                last_error = ex
+            except Exception as ex:
+                self._release(state, False)
+                last_error = ex
+            else:
+                self._release(state, True)
+                return result
+            if retryable is not None and not retryable():
+                break
+        raise last_error
+
+    def _health_loop(self, interval):
+        while True:
+            time.sleep(interval)
+            for state in self.states:
+                try:
+                    healthy = get_client(state.host).ping()
+                except Exception:
+                    healthy = False
+                with self._lock:
+                    if healthy:
+                        state.record_success()
+                    else:
+                        self._record_failure(state)
+
+    def stats(self):
+        with self._lock:
+            return [{
+                "host": state.host,
+                "outstanding": state.outstanding,
+                "requests": state.total_requests,
+                "failures": state.total_failures,
+                "circuit_open": state.opened_at is not None,
+            } for state in self.states]
+
+
+def load_pools():
+    """
+        Reads the host pools from the LOLLMS_NODES_POOLS environment variable, a json object mapping pool names to
+        either a list of hosts or {"hosts": [...], "strategy": "round_robin"}.
+    """
+    pools = json.loads(os.environ.get("LOLLMS_NODES_POOLS", "{}") or "{}")
+    return {name: pool if isinstance(pool, dict) else {"hosts": pool} for name, pool in pools.items()}
+
+
+def parse_host_spec(lollms_host):
+    """
+        Returns `(hosts, strategy)` for a lollms_host input: a single address, several addresses separated by
+        commas, spaces or new lines, or `pool:<name>` referring to a pool of LOLLMS_NODES_POOLS.
+    """
+    spec = lollms_host.strip()
+    strategy = os.environ.get("LOLLMS_NODES_BALANCING", "least_outstanding")
+    if spec.startswith("pool:"):
+        name = spec[len("pool:"):].strip()
+        pools = load_pools()
+        if name not in pools:
+            raise ValueError(f"Unknown lollms host pool {name}, known pools: {', '.join(sorted(pools)) or 'none'} (see LOLLMS_NODES_POOLS)")
+        return [host.rstrip("/") for host in pools[name]["hosts"]], pools[name].get("strategy", strategy)
+    hosts = [host.rstrip("/") for host in re.split(r"[\s,]+", spec) if host]
+    return hosts, strategy
+
+
+_balancers = {}
+_balancers_lock = threading.Lock()
+
+def get_balancer(lollms_host):
+    """
+        Returns the shared balancer of a lollms_host input, a single host gives a balancer of one.
+        Inputs naming the same hosts with the same strategy share one balancer, whatever their spelling.
+    """
+    hosts, strategy = parse_host_spec(lollms_host)
+    if not hosts:
+        raise ValueError("lollms_host is empty")
+    key = (tuple(hosts), strategy)
+    with _balancers_lock:
+        balancer = _balancers.get(key)
+        if balancer is None:
+            balancer = LoadBalancer(
+                hosts,
+                strategy=strategy,
+                failure_threshold=int(os.environ.get("LOLLMS_NODES_FAILURE_THRESHOLD", 3)),
+                cooldown=float(os.environ.get("LOLLMS_NODES_CIRCUIT_COOLDOWN", 30)),
+                health_interval=float(os.environ.get("LOLLMS_NODES_HEALTH_INTERVAL", 10)),
+            )
+            _balancers[key] = balancer
+        return balancer
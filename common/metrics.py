@@ -0,0 +1,202 @@
+import bisect
+import contextvars
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the span histogram buckets in seconds, from a tokenization to a slow generation
+SPAN_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_logger = logging.getLogger("lollms_nodes")
+if os.environ.get("LOLLMS_NODES_LOG_LEVEL"):
+    _level = os.environ["LOLLMS_NODES_LOG_LEVEL"].strip().upper()
+    # getLevelName maps the known level names to their number, anything else to a "Level ..." string
+    if isinstance(logging.getLevelName(_level), int):
+        _logger.setLevel(_level)
+    else:
+        _logger.warning("Ignoring LOLLMS_NODES_LOG_LEVEL=%r, expected one of DEBUG, INFO, WARNING, ERROR, CRITICAL", os.environ["LOLLMS_NODES_LOG_LEVEL"])
+
+# Name of the node being executed, spans recorded by the shared modules are attributed to it
+_current_node = contextvars.ContextVar("lollms_nodes_current_node", default=None)
+
+
+def get_logger(name):
+    """
+        Returns the logger of a suite module. All of them are children of the "lollms_nodes" logger,
+        whose level is set with the LOLLMS_NODES_LOG_LEVEL environment variable.
+    """
+    return logging.getLogger(f"lollms_nodes.{name}")
+
+
+def _labels_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items() if value is not None))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Metrics:
+    """
+    Process wide counters and timing histograms of the suite.
+
+    Counters count events (cache hits, retries...), gauges hold current values (queue depths...), spans record
+    how long a named step took in a histogram per step and node. All can be exported in the Prometheus text format or as json.
+    """
+    def __init__(self, buckets=SPAN_BUCKETS):
+        self.buckets = buckets
+        self._counters = {}
+        self._gauges = {}
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _labels_key(labels))] = value
+
+    def observe(self, name, seconds, **labels):
+        labels.setdefault("node", _current_node.get())
+        key = (name, _labels_key(labels))
+        with self._lock:
+            span = self._spans.get(key)
+            if span is None:
+                span = {"count": 0, "sum": 0.0, "max": 0.0, "buckets": [0] * len(self.buckets)}
+                self._spans[key] = span
+            span["count"] += 1
+            span["sum"] += seconds
+            span["max"] = max(span["max"], seconds)
+            index = bisect.bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                span["buckets"][index] += 1
+
+    @contextmanager
+    def span(self, name, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "counters": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in self._counters.items()],
+                "gauges": [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in self._gauges.items()],
+                "spans": [{
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": span["count"],
+                    "sum_seconds": span["sum"],
+                    "max_seconds": span["max"],
+                } for (name, labels), span in self._spans.items()],
+            }
+
+    def to_prometheus(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            gauges = sorted(self._gauges.items())
+            spans = sorted((key, dict(span, buckets=list(span["buckets"]))) for key, span in self._spans.items())
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"lollms_nodes_{name}_total"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        for (name, labels), value in gauges:
+            metric = f"lollms_nodes_{name}"
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} gauge")
+                declared.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        if spans:
+            lines.append("# TYPE lollms_nodes_span_seconds histogram")
+        for (name, labels), span in spans:
+            labels = (("span", name),) + labels
+            cumulative = 0
+            for bound, count in zip(self.buckets, span["buckets"]):
+                cumulative += count
+                lines.append(f"lollms_nodes_span_seconds_bucket{_format_labels(labels, [('le', repr(bound))])} {cumulative}")
+            lines.append(f"lollms_nodes_span_seconds_bucket{_format_labels(labels, [('le', '+Inf')])} {span['count']}")
+            lines.append(f"lollms_nodes_span_seconds_sum{_format_labels(labels)} {span['sum']}")
+            lines.append(f"lollms_nodes_span_seconds_count{_format_labels(labels)} {span['count']}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._spans.clear()
+
+
+_metrics = Metrics()
+
+def get_metrics():
+    return _metrics
+
+
+def instrument_node(function):
+    """
+        Decorator of the node entry points: the whole execution is recorded as a "node" span and the spans
+        recorded meanwhile by the shared modules are attributed to the node. Works on async entry points too.
+    """
+    if inspect.iscoroutinefunction(function):
+        @functools.wraps(function)
+        async def async_wrapper(self, *args, **kwargs):
+            token = _current_node.set(type(self).__name__)
+            try:
+                with _metrics.span("node"):
+                    return await function(self, *args, **kwargs)
+            finally:
+                _current_node.reset(token)
+        return async_wrapper
+
+    @functools.wraps(function)
+    def wrapper(self, *args, **kwargs):
+        node = type(self).__name__
+        token = _current_node.set(node)
+        try:
+            with _metrics.span("node"):
+                return function(self, *args, **kwargs)
+        finally:
+            _current_node.reset(token)
+    return wrapper
+
+
+def register_metrics_routes():
+    """
+        Serves the metrics from the comfyui server:
+            - /lollms_nodes/metrics in the Prometheus text format
+            - /lollms_nodes/metrics.json as json
+        Returns False when not running inside comfyui.
+    """
+    try:
+        from server import PromptServer
+        from aiohttp import web
+        routes = PromptServer.instance.routes
+    except Exception:
+        return False
+
+    @routes.get("/lollms_nodes/metrics")
+    async def prometheus_metrics(request):
+        return web.Response(text=_metrics.to_prometheus(), headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    @routes.get("/lollms_nodes/metrics.json")
+    async def json_metrics(request):
+        return web.json_response(_metrics.snapshot())
+
+    return True
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+
+PROMPT_MEMORY_MODES = ["OFF", "REUSE", "FEW_SHOT"]
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_STOPWORDS = {"a", "an", "the", "of", "some"}
+
+
+def normalize_subject(text):
+    """
+        Lowercases, removes accents, punctuation and articles, so "An autumn forest!" and "autumn forest" match exactly.
+        Letters of other scripts are kept, only their combining marks are removed.
+    """
+    text = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char)).lower()
+    words = [word for word in re.findall(r"\w+", text) if word not in _STOPWORDS]
+    return " ".join(words)
+
+
+def char_ngrams(normalized, n=3):
+    padded = f" {normalized} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def memory_scope(**settings):
+    """
+        Expansions are only compared with expansions made with the same settings (kind, template, style...).
+    """
+    return hashlib.sha256(json.dumps(settings, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:32]
+
+
+def format_examples(matches):
+    """
+        Renders `find` matches as the $examples of a prompt template, one "subject => expansion" line each.
+    """
+    return "".join(f"\n{subject} => {expansion}" for _, subject, expansion in matches)
+
+
+class PromptMemory:
+    """
+    Persistent subject -> expanded prompt memory with similarity lookup.
+
+    Subjects are normalized and compared through their character trigrams. A MinHash signature of the trigrams
+    is split in `bands` bands stored in an indexed SQLite table (locality sensitive hashing), so a lookup
+    only scores the entries sharing a band with the query instead of the whole memory, then ranks them by exact
+    trigram Jaccard similarity.
+
+    Attributes
+    ----------
+    path (`str`):
+        Path of the SQLite file.
+    num_perm (`int`):
+        Number of MinHash permutations, a multiple of bands.
+    bands (`int`):
+        Number of LSH bands, more bands find less similar subjects.
+    """
+    def __init__(self, path, num_perm=64, bands=16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.num_perm = num_perm
+        self.bands = bands
+        generator = random.Random(0x10115)
+        self._permutations = [(generator.randrange(1, _MERSENNE_PRIME), generator.randrange(0, _MERSENNE_PRIME)) for _ in range(num_perm)]
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS expansions ("
+            "id INTEGER PRIMARY KEY, scope TEXT NOT NULL, normalized TEXT NOT NULL, subject TEXT, expansion TEXT NOT NULL, "
+            "time REAL NOT NULL, hits INTEGER NOT NULL DEFAULT 0, UNIQUE(scope, normalized))"
+        )
+        self._db.execute("CREATE TABLE IF NOT EXISTS bands (scope TEXT NOT NULL, band TEXT NOT NULL, expansion_id INTEGER NOT NULL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS bands_lookup ON bands(scope, band)")
+        self._db.commit()
+
+    def _band_keys(self, grams):
+        hashes = [zlib.crc32(gram.encode("utf-8")) for gram in grams]
+        signature = [min((a * value + b) % _MERSENNE_PRIME for value in hashes) for a, b in self._permutations]
+        rows = self.num_perm // self.bands
+        return [f"{band}:" + ",".join(map(str, signature[band * rows:(band + 1) * rows])) for band in range(self.bands)]
+
+    def add(self, scope, subject, expansion, replace=False):
+        """
+            Remembers an expansion. The first expansion of a subject is kept unless `replace` is set.
+            Subjects without any letter or digit are not remembered.
+        """
+        normalized = normalize_subject(subject)
+        if not normalized:
+            return
+        bands = self._band_keys(char_ngrams(normalized))
+        with self._lock:
+            row = self._db.execute("SELECT id FROM expansions WHERE scope=? AND normalized=?", (scope, normalized)).fetchone()
+            if row is not None:
+                if replace:
+                    self._db.execute("UPDATE expansions SET expansion=?, subject=?, time=? WHERE id=?", (expansion, subject, time.time(), row[0]))
+                    self._db.commit()
+                return
+            cursor = self._db.execute(
+                "INSERT INTO expansions(scope, normalized, subject, expansion, time) VALUES (?, ?, ?, ?, ?)",
+                (scope, normalized, subject, expansion, time.time())
+            )
+            self._db.executemany("INSERT INTO bands(scope, band, expansion_id) VALUES (?, ?, ?)", [(scope, band, cursor.lastrowid) for band in bands])
+            self._db.commit()
+
+    def find(self, scope, subject, threshold=0.8, limit=1, max_candidates=256):
+        """
+            Returns up to `limit` `(similarity, subject, expansion)` tuples of remembered subjects whose similarity
+            with the subject is at least `threshold`, most similar first.
+        """
+        normalized = normalize_subject(subject)
+        if not normalized:
+            return []
+        with self._lock:
+            exact = self._db.execute("SELECT id, subject, expansion FROM expansions WHERE scope=? AND normalized=?", (scope, normalized)).fetchone()
+            if exact is not None and limit == 1:
+                self._db.execute("UPDATE expansions SET hits=hits+1 WHERE id=?", (exact[0],))
+                self._db.commit()
+                return [(1.0, exact[1], exact[2])]
+            grams = char_ngrams(normalized)
+            bands = self._band_keys(grams)
+            rows = self._db.execute(
+                f"SELECT id, normalized, subject, expansion FROM expansions WHERE id IN ("
+                f"SELECT expansion_id FROM bands WHERE scope=? AND band IN ({','.join('?' * len(bands))})) "
+                f"ORDER BY time DESC LIMIT ?",
+                (scope, *bands, max_candidates)
+            ).fetchall()
+            matches = []
+            for entry_id, candidate, candidate_subject, expansion in rows:
+                similarity = jaccard(grams, char_ngrams(candidate))
+                if similarity >= threshold:
+                    matches.append((similarity, entry_id, candidate_subject, expansion))
+            matches.sort(key=lambda match: -match[0])
+            matches = matches[:limit]
+            if matches:
+                self._db.executemany("UPDATE expansions SET hits=hits+1 WHERE id=?", [(match[1],) for match in matches])
+                self._db.commit()
+        return [(similarity, candidate_subject, expansion) for similarity, _, candidate_subject, expansion in matches]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM expansions").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_prompt_memory = None
+_prompt_memory_lock = threading.Lock()
+
+def get_prompt_memory():
+    """
+        Returns the process wide prompt memory, stored in LOLLMS_NODES_MEMORY_PATH
+        (default ~/.cache/lollms_nodes/prompt_memory.sqlite).
+    """
+    global _prompt_memory
+    with _prompt_memory_lock:
+        if _prompt_memory is None:
+            path = os.environ.get("LOLLMS_NODES_MEMORY_PATH") or os.path.join(os.path.expanduser("~"), ".cache", "lollms_nodes", "prompt_memory.sqlite")
+            _prompt_memory = PromptMemory(path)
+        return _prompt_memory
@@ -0,0 +1,155 @@
+import os
+import re
+import string
+import threading
+
+BUILTIN_TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "templates")
+TEMPLATE_VARIABLES = ["subject", "style", "language", "default_negative", "examples", "data"]
+# A line using optional variables is left out when they are all empty
+OPTIONAL_VARIABLES = {"style", "language", "examples", "data"}
+
+# Rough LLM token split: words and single punctuation marks, close enough to budget the user input
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+
+def trim_to_token_budget(text, max_tokens):
+    """
+        Cuts the text after its first `max_tokens` tokens (approximated by words and punctuation marks),
+        0 keeps the whole text.
+    """
+    if max_tokens <= 0:
+        return text
+    for count, match in enumerate(_TOKEN_PATTERN.finditer(text), 1):
+        if count == max_tokens:
+            return text[:match.end()]
+    return text
+
+
+def _identifiers(template):
+    identifiers = []
+    for match in template.pattern.finditer(template.template):
+        name = match.group("named") or match.group("braced")
+        if name is not None:
+            identifiers.append(name)
+        elif match.group("invalid") is not None:
+            raise ValueError(f"Invalid placeholder in template line: {template.template!r}")
+    return identifiers
+
+
+class PromptTemplate:
+    """
+    A compiled prompt template.
+
+    Templates use `string.Template` placeholders: $subject, $style, $language, $default_negative, $examples
+    (earlier answers to similar requests, see the prompt memory) and $data (a document given with the request). The lines
+    before the first placeholder are rendered once at compile time, so every request of a template starts with
+    the exact same prefix and the server can reuse its prompt cache for it. Keep the user dependent lines last.
+
+    Attributes
+    ----------
+    name (`str`):
+        Name of the template, the file name without extension.
+    prefix (`str`):
+        The constant beginning of every rendered prompt.
+    """
+    def __init__(self, name, text):
+        self.name = name
+        lines = []
+        for line in text.split("\n"):
+            template = string.Template(line)
+            identifiers = _identifiers(template)
+            unknown = set(identifiers) - set(TEMPLATE_VARIABLES)
+            if unknown:
+                raise ValueError(f"Unknown variables {', '.join(sorted(unknown))} in template {name}, available: {', '.join(TEMPLATE_VARIABLES)}")
+            lines.append((template, OPTIONAL_VARIABLES.intersection(identifiers), bool(identifiers)))
+        static = 0
+        while static < len(lines) and not lines[static][2]:
+            static += 1
+        self.prefix = "\n".join(template.template.replace("$$", "$") for template, _, _ in lines[:static])
+        self._lines = lines[static:]
+        self._has_prefix = static > 0
+
+    def render(self, subject="", style="", language="", default_negative="", max_input_tokens=0, examples="", data=""):
+        values = {
+            "subject": trim_to_token_budget(subject, max_input_tokens),
+            "style": style.strip(),
+            "language": language.strip(),
+            "default_negative": default_negative,
+            "examples": examples,
+            "data": trim_to_token_budget(data.strip(), max_input_tokens),
+        }
+        rendered = [self.prefix] if self._has_prefix else []
+        for template, optional, _ in self._lines:
+            if optional and not any(values[name] for name in optional):
+                continue
+            rendered.append(template.substitute(values))
+        return "\n".join(rendered)
+
+
+class TemplateLibrary:
+    """
+    Named templates read from `<name>.txt` files.
+
+    The folder set in LOLLMS_NODES_TEMPLATES_DIR is searched before the built-in templates folder, so a file
+    there overrides the built-in template of the same name. Templates are compiled once and only recompiled
+    when their file changes.
+    """
+    def __init__(self, folders):
+        self.folders = folders
+        self._compiled = {}
+        self._lock = threading.Lock()
+
+    def _paths(self):
+        paths = {}
+        for folder in reversed(self.folders):
+            if os.path.isdir(folder):
+                for file_name in os.listdir(folder):
+                    if file_name.endswith(".txt"):
+                        paths[file_name[:-len(".txt")]] = os.path.join(folder, file_name)
+        return paths
+
+    def names(self, kind=None):
+        """
+            Returns the template names. With a `kind` ("artbot_positive", "text_gen"...) only the names starting
+            with it are returned, the built-in `kind` template first so it is the default of the node selector.
+        """
+        names = sorted(self._paths())
+        if kind is not None:
+            names = [name for name in names if name.startswith(kind) and name != kind]
+            names.insert(0, kind)
+        return names
+
+    def get(self, name):
+        path = self._paths().get(name)
+        if path is None:
+            raise ValueError(f"Unknown prompt template {name}, available: {', '.join(self.names())}")
+        mtime = os.path.getmtime(path)
+        with self._lock:
+            compiled = self._compiled.get(name)
+            if compiled is None or compiled[0] != (path, mtime):
+                with open(path, "r", encoding="utf-8") as f:
+                    text = f.read()
+                if text.endswith("\n"):
+                    text = text[:-1]
+                compiled = ((path, mtime), PromptTemplate(name, text))
+                self._compiled[name] = compiled
+            return compiled[1]
+
+    def fingerprint(self, *names):
+        """
+            Identifies the current version of the given templates, used by IS_CHANGED so edited templates rerun the nodes.
+        """
+        paths = self._paths()
+        return [(name, os.path.getmtime(paths[name])) if name in paths else (name, None) for name in names]
+
+
+_template_library = None
+_template_library_lock = threading.Lock()
+
+def get_template_library():
+    global _template_library
+    with _template_library_lock:
+        if _template_library is None:
+            folders = [os.environ["LOLLMS_NODES_TEMPLATES_DIR"]] if os.environ.get("LOLLMS_NODES_TEMPLATES_DIR") else []
+            _template_library = TemplateLibrary(folders + [BUILTIN_TEMPLATES_DIR])
+        return _template_library
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_MODES = ["on", "off", "refresh"]
+
+
+class ResponseCache:
+    """
+    A two tier cache for lollms text responses
+
+    Entries are content addressed: the key is a hash of the host, the full prompt text
+    and the generation parameters, so two nodes asking the same thing share the answer.
+
+    Attributes
+    ----------
+    max_entries (`int`):
+        Number of responses kept in the in-memory LRU tier.
+    ttl (`float` or None):
+        Lifetime of an entry in seconds. None means entries never expire.
+    disk_path (`str` or None):
+        Path of the SQLite file used as second tier. None disables the disk tier.
+    disk_max_bytes (`int`):
+        Maximum size of the stored responses in the disk tier, oldest accessed entries are evicted first.
+    """
+    def __init__(self, max_entries=512, ttl=None, disk_path=None, disk_max_bytes=256*1024*1024):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_path = disk_path
+        self.disk_max_bytes = disk_max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        # Size of the stored responses in the disk tier, kept up to date instead of summed on every put
+        self._disk_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.stores = 0
+        if disk_path:
+            self._open_disk(disk_path)
+
+    @staticmethod
+    def make_key(host, prompt, params=None):
+        payload = json.dumps({"host": host, "prompt": prompt, "params": params or {}}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _open_disk(self, path):
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._disk = sqlite3.connect(path, check_same_thread=False)
+        self._disk.execute("PRAGMA journal_mode=WAL")
+        self._disk.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL, size INTEGER NOT NULL)"
+        )
+        self._disk.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._disk.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses(created)")
+        self._disk.commit()
+        self._disk_bytes = self._disk.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+            if self._disk is not None:
+                row = self._disk.execute("SELECT value, created, size FROM responses WHERE key=?", (key,)).fetchone()
+                if row is not None:
+                    value, created, size = row
+                    if not self._expired(created, now):
+                        self._disk.execute("UPDATE responses SET accessed=? WHERE key=?", (now, key))
+                        self._disk.commit()
+                        self._remember(key, value, created)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return value
+                    self._disk.execute("DELETE FROM responses WHERE key=?", (key,))
+                    self._disk.commit()
+                    self._disk_bytes -= size
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self.stores += 1
+            if self._disk is not None:
+                size = len(value.encode("utf-8"))
+                replaced = self._disk.execute("SELECT size FROM responses WHERE key=?", (key,)).fetchone()
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO responses(key, value, created, accessed, size) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, now, now, size)
+                )
+                self._disk_bytes += size - (replaced[0] if replaced else 0)
+                self._evict_disk(now)
+                self._disk.commit()
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self, now):
+        if self.ttl is not None:
+            expired = self._disk.execute("SELECT COALESCE(SUM(size), 0) FROM responses WHERE created < ?", (now - self.ttl,)).fetchone()[0]
+            if expired:
+                self._disk.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+                self._disk_bytes -= expired
+        if self._disk_bytes <= self.disk_max_bytes:
+            return
+        while self._disk_bytes > self.disk_max_bytes:
+            # Once full, a put usually evicts one or two entries, only the oldest few are read
+            oldest = self._disk.execute("SELECT key, size FROM responses ORDER BY accessed ASC LIMIT 16").fetchall()
+            if not oldest:
+                self._disk_bytes = 0
+                break
+            for key, size in oldest:
+                self._disk.execute("DELETE FROM responses WHERE key=?", (key,))
+                self._disk_bytes -= size
+                if self._disk_bytes <= self.disk_max_bytes:
+                    break
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM responses")
+                self._disk.commit()
+                self._disk_bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "stores": self.stores,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+
+_response_cache = None
+_response_cache_lock = threading.Lock()
+
+def get_response_cache():
+    """
+        Returns the process wide response cache shared by all lollms nodes.
+        It is configured through environment variables:
+            - LOLLMS_NODES_CACHE_SIZE: number of in-memory entries (default 512)
+            - LOLLMS_NODES_CACHE_TTL: entry lifetime in seconds (default: no expiry)
+            - LOLLMS_NODES_CACHE_DIR: folder of the on-disk tier (default: disk tier disabled)
+            - LOLLMS_NODES_CACHE_DISK_MB: maximum size of the on-disk tier (default 256)
+    """
+    global _response_cache
+    with _response_cache_lock:
+        if _response_cache is None:
+            ttl = os.environ.get("LOLLMS_NODES_CACHE_TTL")
+            cache_dir = os.environ.get("LOLLMS_NODES_CACHE_DIR")
+            _response_cache = ResponseCache(
+                max_entries=int(os.environ.get("LOLLMS_NODES_CACHE_SIZE", 512)),
+                ttl=float(ttl) if ttl else None,
+                disk_path=os.path.join(cache_dir, "responses.sqlite") if cache_dir else None,
+                disk_max_bytes=int(float(os.environ.get("LOLLMS_NODES_CACHE_DISK_MB", 256))*1024*1024),
+            )
+        return _response_cache
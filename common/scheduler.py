@@ -0,0 +1,150 @@
+import collections
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from .metrics import get_metrics
+
+# Interactive requests are always served first, batch requests take what capacity is left
+PRIORITIES = ["interactive", "batch"]
+
+
+class HostScheduler:
+    """
+    Admission control of the requests sent to one lollms host.
+
+    A request waits until it is the first of the highest priority queue, a concurrency slot is free and the
+    token bucket holds a token. Batch requests can't take the last `interactive_reserve` slots, so an interactive
+    request never waits behind a full batch sweep for more than one slot to free up, while batch requests
+    still keep the other slots busy.
+
+    Attributes
+    ----------
+    host (`str`):
+        Base address of the lollms server.
+    max_concurrency (`int`):
+        Maximum number of requests running at once on the host, 0 for no limit.
+    rate (`float`):
+        Requests started per second, 0 for no limit.
+    burst (`int`):
+        Size of the token bucket, the number of requests that can start at once after an idle period.
+    interactive_reserve (`int`):
+        Slots only interactive requests can use, at most max_concurrency - 1.
+    """
+    def __init__(self, host, max_concurrency=8, rate=0.0, burst=0, interactive_reserve=1):
+        self.host = host
+        self.max_concurrency = max_concurrency
+        self.rate = rate
+        self.burst = max(1, burst or int(rate) or 1)
+        # At least one slot stays usable by batch requests, otherwise they would wait forever
+        self.interactive_reserve = max(0, min(interactive_reserve, max_concurrency - 1))
+        self.running = 0
+        self._tokens = float(self.burst)
+        self._refilled = time.monotonic()
+        self._queues = {priority: collections.deque() for priority in PRIORITIES}
+        self._condition = threading.Condition()
+
+    def _refill(self, now):
+        if self.rate > 0:
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _wait_time(self, ticket, priority):
+        """
+            Returns 0 when the request can start, otherwise how long to wait at most before checking again (None: until notified).
+        """
+        head = next((queue[0] for queue in self._queues.values() if queue), None)
+        if head is not ticket:
+            return None
+        if self.max_concurrency:
+            limit = self.max_concurrency if priority == "interactive" else self.max_concurrency - self.interactive_reserve
+            if self.running >= limit:
+                return None
+        if self.rate > 0:
+            self._refill(time.monotonic())
+            if self._tokens < 1:
+                return (1 - self._tokens) / self.rate
+        return 0
+
+    def _publish_depths(self):
+        metrics = get_metrics()
+        for priority, queue in self._queues.items():
+            metrics.set_gauge("scheduler_queue_depth", len(queue), host=self.host, priority=priority)
+        metrics.set_gauge("scheduler_running", self.running, host=self.host)
+
+    def acquire(self, priority="interactive"):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority}, expected one of {', '.join(PRIORITIES)}")
+        ticket = object()
+        start = time.perf_counter()
+        with self._condition:
+            self._queues[priority].append(ticket)
+            self._publish_depths()
+            while True:
+                wait = self._wait_time(ticket, priority)
+                if wait == 0:
+                    break
+                self._condition.wait(wait)
+            self._queues[priority].popleft()
+            self.running += 1
+            if self.rate > 0:
+                self._tokens -= 1
+            self._publish_depths()
+            # The next request in line may be able to start too
+            self._condition.notify_all()
+        get_metrics().observe("queue_wait", time.perf_counter() - start, priority=priority)
+
+    def release(self):
+        with self._condition:
+            self.running -= 1
+            self._publish_depths()
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, priority="interactive"):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        with self._condition:
+            return {"host": self.host, "running": self.running, **{f"queued_{priority}": len(queue) for priority, queue in self._queues.items()}}
+
+
+def host_limits(host):
+    """
+        Returns the scheduler settings of a host: LOLLMS_NODES_HOST_CONCURRENCY (default 8), LOLLMS_NODES_HOST_RATE
+        (requests per second, default no limit), LOLLMS_NODES_HOST_BURST and LOLLMS_NODES_INTERACTIVE_RESERVE (default 1),
+        overridden per host by LOLLMS_NODES_HOST_LIMITS, a json object mapping host addresses to
+        {"concurrency": ..., "rate": ..., "burst": ..., "interactive_reserve": ...}.
+    """
+    limits = {
+        "max_concurrency": int(os.environ.get("LOLLMS_NODES_HOST_CONCURRENCY", 8)),
+        "rate": float(os.environ.get("LOLLMS_NODES_HOST_RATE", 0)),
+        "burst": int(os.environ.get("LOLLMS_NODES_HOST_BURST", 0)),
+        "interactive_reserve": int(os.environ.get("LOLLMS_NODES_INTERACTIVE_RESERVE", 1)),
+    }
+    overrides = dict(json.loads(os.environ.get("LOLLMS_NODES_HOST_LIMITS", "{}") or "{}").get(host, {}))
+    if "concurrency" in overrides:
+        overrides["max_concurrency"] = overrides.pop("concurrency")
+    limits.update(overrides)
+    return limits
+
+
+_schedulers = {}
+_schedulers_lock = threading.Lock()
+
+def get_scheduler(host):
+    """
+        Returns the process wide scheduler of a lollms host address.
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get(host)
+        if scheduler is None:
+            scheduler = HostScheduler(host, **host_limits(host))
+            _schedulers[host] = scheduler
+        return scheduler
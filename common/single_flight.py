@@ -0,0 +1,45 @@
+import threading
+from concurrent.futures import Future
+
+from .metrics import get_metrics
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent identical calls.
+
+    The first caller of a key runs the function, callers arriving with the same key while it runs wait for
+    it and receive the same result (or exception) instead of running the function again.
+    """
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, function):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.coalesced += 1
+        if not leader:
+            get_metrics().increment("coalesced_requests")
+            return future.result()
+        try:
+            result = function()
+        except BaseException as ex:
+            future.set_exception(ex)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,81 @@
+import threading
+
+from .metrics import get_metrics
+
+CLIP_CHUNK_TOKENS = 77
+
+
+def count_clip_chunks(clip, text):
+    """
+        Returns the number of 77 tokens chunks CLIP needs to encode the text.
+    """
+    with get_metrics().span("tokenize"):
+        tokens = clip.tokenize(text)
+    if isinstance(tokens, dict):
+        return max(len(chunks) for chunks in tokens.values())
+    return len(tokens)
+
+
+class StreamProgress:
+    """
+    Reports the progress of one or more streamed generations to the comfyui progress bar.
+    Every stream counts for `steps_per_stream` steps, one step per received chunk.
+    """
+    def __init__(self, streams, steps_per_stream):
+        import comfy.utils
+        self.steps_per_stream = steps_per_stream
+        self.steps = [0] * streams
+        self.bar = comfy.utils.ProgressBar(streams * steps_per_stream)
+        self._lock = threading.Lock()
+
+    def advance(self, index):
+        with self._lock:
+            if self.steps[index] < self.steps_per_stream:
+                self.steps[index] += 1
+                self.bar.update_absolute(sum(self.steps))
+
+    def finish(self, index):
+        with self._lock:
+            self.steps[index] = self.steps_per_stream
+            self.bar.update_absolute(sum(self.steps))
+
+    def callback(self, index, inner=None):
+        """
+            Builds the streaming callback of one stream, `inner` is an optional callback
+            that can still stop the generation.
+        """
+        def on_chunk(chunk):
+            if inner is not None and inner(chunk) is False:
+                return False
+            self.advance(index)
+            return True
+        return on_chunk
+
+
+class ClipTokenBudget:
+    """
+    Streaming callback that stops the generation once the text would need more than
+    `max_chunks` CLIP chunks, tokens past that point would only make the conditioning longer.
+    The token count is only refreshed at word boundaries, and only when the text grew enough to possibly
+    cross the budget: a CLIP token covers at least one utf-8 byte, so after a count of `chunks` chunks the
+    text can grow by `(max_chunks - chunks) * 75` bytes without needing a new chunk. Far from the budget
+    the whole text is tokenized every few dozen words instead of at every word.
+    """
+    def __init__(self, clip, max_chunks):
+        self.clip = clip
+        self.max_chunks = max_chunks
+        self.text = ""
+        self._size = 0
+        self._next_check = 0
+
+    def __call__(self, chunk):
+        candidate = self.text + chunk
+        size = self._size + len(chunk.encode("utf-8"))
+        if size >= self._next_check and any(char.isspace() or char in ",.;:" for char in chunk):
+            chunks = count_clip_chunks(self.clip, candidate)
+            if chunks > self.max_chunks:
+                return False
+            self._next_check = size + (self.max_chunks - chunks) * (CLIP_CHUNK_TOKENS - 2)
+        self.text = candidate
+        self._size = size
+        return True
@@ -0,0 +1,36 @@
+import json
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class PhaseTimer:
+    """
+    Accumulates the wall time spent in the named phases of a node execution.
+    Phases can overlap, so their sum may be larger than the "total" phase.
+    """
+    def __init__(self):
+        self.timings = OrderedDict()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def milliseconds(self):
+        return {name: round(seconds * 1000, 3) for name, seconds in self.timings.items()}
+
+    def to_json(self):
+        return json.dumps(self.milliseconds())
+
+    def summary(self):
+        """
+            Returns the timings as `phase_ms=value` pairs, easy to parse out of the logs.
+        """
+        return " ".join(f"{name}_ms={seconds * 1000:.1f}" for name, seconds in self.timings.items())
@@ -1,18 +1,29 @@
+import functools
 import importlib
+import importlib.util
 class PackageManager:
     @staticmethod
     def install_package(package_name):
         import subprocess
         import sys
         subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", package_name])
+        PackageManager.check_package_installed.cache_clear()
         
     @staticmethod
+    @functools.lru_cache(maxsize=None)
     def check_package_installed(package_name):
+        # Looks the package up without importing it, the answer is cached for the whole process
         try:
-            importlib.import_module(package_name)
-            return True
-        except ImportError:
+            return importlib.util.find_spec(package_name) is not None
+        except (ImportError, ValueError):
             return False
+
+    @staticmethod
+    def missing_packages(package_names):
+        """
+            Returns the packages of the list that are not installed, never installs anything.
+        """
+        return [package_name for package_name in package_names if not PackageManager.check_package_installed(package_name)]
         
     @staticmethod
     def safe_import(module_name, library_name=None):
@@ -0,0 +1,94 @@
+from ..common.change_detection import hash_inputs
+from ..common.metrics import get_metrics, instrument_node
+from .prompt_dataset import open_dataset
+
+class Lollms_Prompt_Exporter:
+    """
+    A Lollms_Prompt_Exporter node, appends generated prompts to a SQLite prompt dataset
+
+    Class methods
+    -------------
+    INPUT_TYPES (dict): 
+        Tell the main program input parameters of nodes.
+    IS_CHANGED:
+        optional method to control when the node is re executed.
+
+    Attributes
+    ----------
+    RETURN_TYPES (`tuple`): 
+        The type of each element in the output tulple.
+    RETURN_NAMES (`tuple`):
+        Optional: The name of each output in the output tulple.
+    FUNCTION (`str`):
+        The name of the entry-point method. For Lollms_Prompt_Exporter, if `FUNCTION = "execute"` then it will run Lollms_Prompt_Exporter().execute()
+    OUTPUT_NODE ([`bool`]):
+        If this node is an output node that outputs a result/image from the graph. The SaveImage node is an output node.
+        The backend iterates on these output nodes and tries to execute all their parents if their parent graph is properly connected.
+        Assumed to be False if not present.
+    CATEGORY (`str`):
+        The category the node should appear in the UI.
+    execute(s) -> tuple || None:
+        The entry point method. The name of this method must be the same as the value of property `FUNCTION`.
+        For Lollms_Prompt_Exporter, if `FUNCTION = "execute"` then this method's name must be `execute`, if `FUNCTION = "foo"` then it must be `foo`.
+    """
+    def __init__(self):
+        import comfy.model_management
+        self.device = comfy.model_management.intermediate_device()
+    
+    @classmethod
+    def INPUT_TYPES(s):
+        """
+            Return a dictionary which contains config for all input fields.
+            Some types (string): "MODEL", "VAE", "CLIP", "CONDITIONING", "LATENT", "IMAGE", "INT", "STRING", "FLOAT".
+            Input types "INT", "STRING" or "FLOAT" are special values for fields on the node.
+            The type can be a list for selection.
+
+            Returns: `dict`:
+                - Key input_fields_group (`string`): Can be either required, hidden or optional. A node class must have property `required`
+                - Value input_fields (`dict`): Contains input fields config:
+                    * Key field_name (`string`): Name of a entry-point method's argument
+                    * Value field_config (`tuple`):
+                        + First value is a string indicate the type of field or a list for selection.
+                        + Secound value is a config for type "INT", "STRING" or "FLOAT".
+        """
+        return {
+            "required": {
+                "path": ("STRING", {"default": "lollms_prompts.sqlite"}),
+                "prompt": ("STRING", {"forceInput": True}),
+                "response": ("STRING", {"forceInput": True}),
+            },
+            "optional": {
+                "negative": ("STRING", {"forceInput": True}),
+                "metadata": ("STRING", {"multiline": True, "default": ""}),
+            },
+        }
+
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("Record hash",)
+
+    FUNCTION = "export"
+
+    OUTPUT_NODE = True
+
+    CATEGORY = "Lollms/Lollms_Prompt_Exporter"
+
+    @instrument_node
+    def export(self, path, prompt, response, negative=None, metadata=None):
+        with get_metrics().span("disk_write"):
+            digest = open_dataset(path).add(prompt, response, negative=negative, metadata=metadata or None)
+        return (digest,)
+
+    """
+        The node will always be re executed if any of the inputs change but
+        this method can be used to force the node to execute again even when the inputs don't change.
+        You can make this node return a number or a string. This value will be compared to the one returned the last time the node was
+        executed, if it is different the node will be executed again.
+        This method is used in the core repo for the LoadImage node where they return the image hash as a string, if the image hash
+        changes between executions the LoadImage node is executed again.
+    """
+    @classmethod
+    def IS_CHANGED(s, **kwargs):
+        return hash_inputs(**kwargs)
+
+# Set the web directory, any .js file in that directory will be loaded by the frontend as a frontend extension
+# WEB_DIRECTORY = "./somejs"
@@ -1,10 +1,11 @@
-from ..package_manager import PackageManager
-if not PackageManager.check_package_installed("lollms_client"):
-    PackageManager.install_package("lollms_client")
-
-import comfy.model_management
-from lollms_client import LollmsClient
-import torch
+from ..common.async_nodes import comfy_supports_async_nodes
+from ..common.change_detection import ALWAYS_CHANGED, hash_inputs
+from ..common.generation import generate_text
+from ..common.metrics import instrument_node
+from ..common.prompt_templates import get_template_library
+from ..common.response_cache import CACHE_MODES
+from ..common.scheduler import PRIORITIES
+from ..common.streaming import StreamProgress
 
 MAX_RESOLUTION=16384
 
@@ -38,8 +39,8 @@ class Lollms_Text_Gen:
         For Lollms_Text_Gen, if `FUNCTION = "execute"` then this method's name must be `execute`, if `FUNCTION = "foo"` then it must be `foo`.
     """
     def __init__(self):
+        import comfy.model_management
         self.device = comfy.model_management.intermediate_device()
-        self.lollms = LollmsClient()
     
     @classmethod
     def INPUT_TYPES(s):
@@ -67,25 +68,55 @@ class Lollms_Text_Gen:
                     "multiline": True, #True if you want the field to look like the one on the ClipTextEncode node
                     "default": "Hello World!"
                 }),
-                "data": ("STRING"),
+                "data": ("STRING", {"multiline": True, "default": ""}),
+            },
+            "optional": {
+                "stream":(["NO","YES"],),
+                "max_tokens": ("INT", {"default": 1024, "min": 16, "max": 8192}),
+                "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffff, "control_after_generate": False}),
+                "regenerate":(["NO","YES"],),
+                "template":(get_template_library().names("text_gen"),),
+                "language": ("STRING", {"multiline": False, "default": ""}),
+                "max_input_tokens": ("INT", {"default": 0, "min": 0, "max": 8192}),
+                "priority":(PRIORITIES,),
+                # Appended after the older widgets so saved workflows keep their widget values
+                "cache":(CACHE_MODES, {"default": "on"}),
             },
         }
 
     RETURN_TYPES = ("STRING",)
     RETURN_NAMES = ("Response",)
 
-    FUNCTION = "build_prompt"
+    # comfyui versions that await coroutine node functions keep executing while lollms generates
+    FUNCTION = "build_prompt_async" if comfy_supports_async_nodes() else "build_prompt"
 
     #OUTPUT_NODE = False
 
     CATEGORY = "Lollms/Lollms_Text_Gen"
 
-    def build_prompt(self, clip, lollms_host, build_negative_prompt, width, height, batch_size, prompt):
-        #do some processing on the image, in this Lollms_Text_Gen I just invert it
-        full_prompt = "!@>system: You are a helpful AI agent. Help the user perform his tasks.\n!@>user:" + prompt + "!@>Lollms_Text_Gen:"
-        answer = self.lollms.generate_text(lollms_host,full_prompt)
+    @instrument_node
+    def build_prompt(self, lollms_host, prompt, data, stream="NO", max_tokens=1024, seed=0, regenerate="NO", template="text_gen", language="", max_input_tokens=0, priority="interactive", cache="on"):
+        full_prompt = get_template_library().get(template).render(subject=prompt, language=language, max_input_tokens=max_input_tokens, data=data)
+        if regenerate=="YES":
+            cache = "refresh"
+        params = {"n_predict": max_tokens}
+        if seed:
+            params["seed"] = seed
+        if stream=="YES":
+            progress = StreamProgress(1, max_tokens)
+            answer = generate_text(lollms_host, full_prompt, cache=cache, streaming_callback=progress.callback(0), priority=priority, **params)
+            progress.finish(0)
+        else:
+            answer = generate_text(lollms_host, full_prompt, cache=cache, priority=priority, **params)
         return (answer,)
 
+    async def build_prompt_async(self, *args, **kwargs):
+        """
+            Same as build_prompt, the request runs in a worker thread so the comfyui event loop isn't blocked.
+        """
+        import asyncio
+        return await asyncio.to_thread(self.build_prompt, *args, **kwargs)
+
     """
         The node will always be re executed if any of the inputs change but
         this method can be used to force the node to execute again even when the inputs don't change.
@@ -94,9 +125,11 @@ class Lollms_Text_Gen:
         This method is used in the core repo for the LoadImage node where they return the image hash as a string, if the image hash
         changes between executions the LoadImage node is executed again.
     """
-    #@classmethod
-    #def IS_CHANGED(s, image, string_field, int_field, float_field, print_to_screen):
-    #    return ""
+    @classmethod
+    def IS_CHANGED(s, regenerate="NO", **kwargs):
+        if regenerate=="YES":
+            return ALWAYS_CHANGED
+        return hash_inputs(templates=get_template_library().fingerprint(kwargs.get("template", "text_gen")), **kwargs)
 
 # Set the web directory, any .js file in that directory will be loaded by the frontend as a frontend extension
 # WEB_DIRECTORY = "./somejs"
@@ -1,8 +1,7 @@
-from ..package_manager import PackageManager
-if not PackageManager.check_package_installed("lollms_client"):
-    PackageManager.install_package("lollms_client")
-
-import comfy.model_management
+import os
+from ..common.change_detection import hash_inputs
+from ..common.metrics import instrument_node
+from .text_writer import COMPRESSIONS, WRITE_MODES, check_compression, encode_payload, get_text_writer, write_blocks
 
 MAX_RESOLUTION=16384
 
@@ -36,6 +35,7 @@ class Lollms_Text_Saver:
         For Lollms_Text_Gen, if `FUNCTION = "execute"` then this method's name must be `execute`, if `FUNCTION = "foo"` then it must be `foo`.
     """
     def __init__(self):
+        import comfy.model_management
         self.device = comfy.model_management.intermediate_device()
     
     @classmethod
@@ -59,6 +59,13 @@ class Lollms_Text_Saver:
                 "text": ("STRING",),
                 "path": ("STRING",),
             },
+            "optional": {
+                "mode":(WRITE_MODES,),
+                "compression":(COMPRESSIONS,),
+                "asynchronous":(["NO","YES"],),
+                "prompt": ("STRING", {"forceInput": True}),
+                "metadata": ("STRING", {"multiline": True, "default": ""}),
+            },
         }
 
     RETURN_TYPES = ()
@@ -71,9 +78,15 @@ class Lollms_Text_Saver:
 
     CATEGORY = "Lollms/Lollms_Text_Saver"
 
-    def save_text(self, text, path):
-        with open(path,"w", encoding="utf-8") as f:
-            f.write(text) 
+    @instrument_node
+    def save_text(self, text, path, mode="overwrite", compression="none", asynchronous="NO", prompt=None, metadata=None):
+        check_compression(compression)
+        payload = encode_payload(mode, text, prompt, metadata)
+        if asynchronous=="YES":
+            # Returns as soon as the write is queued, the writer thread batches the disk accesses
+            get_text_writer().submit(path, mode, compression, payload)
+        else:
+            write_blocks(path, mode, compression, [payload])
         return ()
 
     """
@@ -84,9 +97,10 @@ class Lollms_Text_Saver:
         This method is used in the core repo for the LoadImage node where they return the image hash as a string, if the image hash
         changes between executions the LoadImage node is executed again.
     """
-    #@classmethod
-    #def IS_CHANGED(s, image, string_field, int_field, float_field, print_to_screen):
-    #    return ""
+    @classmethod
+    def IS_CHANGED(s, path=None, **kwargs):
+        # A deleted or moved output file must be written again
+        return hash_inputs(path=path, exists=bool(path) and os.path.exists(path), **kwargs)
 
 # Set the web directory, any .js file in that directory will be loaded by the frontend as a frontend extension
 # WEB_DIRECTORY = "./somejs"
@@ -1,43 +1,49 @@
-from ..package_manager import PackageManager
-if not PackageManager.check_package_installed("lollms_client"):
-    PackageManager.install_package("lollms_client")
-
-import comfy.model_management
+from ..common.async_nodes import comfy_supports_async_nodes
+from ..common.change_detection import ALWAYS_CHANGED, hash_inputs
+from ..common.generation import generate_text
+from ..common.metrics import instrument_node
+from ..common.prompt_templates import get_template_library
+from ..common.response_cache import CACHE_MODES
+from ..common.scheduler import PRIORITIES
+from ..common.streaming import StreamProgress
+from .text_display import TextDisplayStream
 
 MAX_RESOLUTION=16384
 
-class Lollms_Text_Gen:
+class Lollms_Text_Visualize:
     """
-    A Lollms_Text_Gen node
+    A Lollms_Text_Visualize node, shows a text in the node itself.
+    When the `text` input is not connected, the node generates the answer of its prompt and the text is shown while lollms streams it.
 
     Class methods
     -------------
-    INPUT_TYPES (dict): 
+    INPUT_TYPES (dict):
         Tell the main program input parameters of nodes.
     IS_CHANGED:
         optional method to control when the node is re executed.
 
     Attributes
     ----------
-    RETURN_TYPES (`tuple`): 
+    RETURN_TYPES (`tuple`):
         The type of each element in the output tulple.
     RETURN_NAMES (`tuple`):
         Optional: The name of each output in the output tulple.
     FUNCTION (`str`):
-        The name of the entry-point method. For Lollms_Text_Gen, if `FUNCTION = "execute"` then it will run Lollms_Text_Gen().execute()
+        The name of the entry-point method. For Lollms_Text_Visualize, if `FUNCTION = "execute"` then it will run Lollms_Text_Visualize().execute()
     OUTPUT_NODE ([`bool`]):
-        If this node is an output node that outputs a result/image from the graph. The SaveImage node is an Lollms_Text_Gen.
+        If this node is an output node that outputs a result/image from the graph. The SaveImage node is an example.
         The backend iterates on these output nodes and tries to execute all their parents if their parent graph is properly connected.
         Assumed to be False if not present.
     CATEGORY (`str`):
         The category the node should appear in the UI.
     execute(s) -> tuple || None:
         The entry point method. The name of this method must be the same as the value of property `FUNCTION`.
-        For Lollms_Text_Gen, if `FUNCTION = "execute"` then this method's name must be `execute`, if `FUNCTION = "foo"` then it must be `foo`.
+        For Lollms_Text_Visualize, if `FUNCTION = "execute"` then this method's name must be `execute`, if `FUNCTION = "foo"` then it must be `foo`.
     """
     def __init__(self):
+        import comfy.model_management
         self.device = comfy.model_management.intermediate_device()
-    
+
     @classmethod
     def INPUT_TYPES(s):
         """
@@ -56,24 +62,62 @@ class Lollms_Text_Gen:
         """
         return {
             "required": {
-                "text": ("STRING",),
+                "lollms_host": ("STRING",{
+                    "multiline": False,
+                    "default": "http://localhost:9600"
+                }),
+                "prompt": ("STRING",{
+                    "multiline": True,
+                    "default": "Hello World!"
+                }),
+                "cache":(CACHE_MODES,),
+            },
+            "optional": {
+                "text": ("STRING", {"forceInput": True}),
+                "max_tokens": ("INT", {"default": 1024, "min": 16, "max": 8192}),
+                "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffff, "control_after_generate": False}),
+                "max_display_chars": ("INT", {"default": 20000, "min": 0, "max": 10000000}),
+                "template":(get_template_library().names("text_gen"),),
+                "regenerate":(["NO","YES"],),
+                "priority":(PRIORITIES,),
+            },
+            "hidden": {
+                "unique_id": "UNIQUE_ID",
             },
         }
 
-    RETURN_TYPES = ()
-    RETURN_NAMES = ()
+    RETURN_TYPES = ("STRING",)
+    RETURN_NAMES = ("Text",)
 
-    FUNCTION = "build_prompt"
+    # comfyui versions that await coroutine node functions keep executing while lollms generates
+    FUNCTION = "visualize_async" if comfy_supports_async_nodes() else "visualize"
 
-    #OUTPUT_NODE = True
+    OUTPUT_NODE = True
 
     CATEGORY = "Lollms/Lollms_Text_Viewer"
 
-    def build_prompt(self, clip, lollms_host, build_negative_prompt, width, height, batch_size, prompt):
-        #do some processing on the image, in this Lollms_Text_Gen I just invert it
-        full_prompt = "!@>system: You are a helpful AI agent. Help the user perform his tasks.\n!@>user:" + prompt + "!@>Lollms_Text_Gen:"
-        answer = generate_text(lollms_host,full_prompt)
-        return (answer,)
+    @instrument_node
+    def visualize(self, lollms_host, prompt, cache, text=None, max_tokens=1024, seed=0, max_display_chars=20000, template="text_gen", regenerate="NO", priority="interactive", unique_id=None):
+        display = TextDisplayStream(unique_id, max_display_chars)
+        if text is None:
+            if regenerate=="YES":
+                cache = "refresh"
+            params = {"n_predict": max_tokens}
+            if seed:
+                params["seed"] = seed
+            full_prompt = get_template_library().get(template).render(subject=prompt)
+            progress = StreamProgress(1, max_tokens)
+            text = generate_text(lollms_host, full_prompt, cache=cache, streaming_callback=progress.callback(0, display), priority=priority, **params)
+            progress.finish(0)
+        shown = display.finish(text)
+        return {"ui": {"text": [shown]}, "result": (text,)}
+
+    async def visualize_async(self, *args, **kwargs):
+        """
+            Same as visualize, the request runs in a worker thread so the comfyui event loop isn't blocked.
+        """
+        import asyncio
+        return await asyncio.to_thread(self.visualize, *args, **kwargs)
 
     """
         The node will always be re executed if any of the inputs change but
@@ -83,9 +127,11 @@ class Lollms_Text_Gen:
         This method is used in the core repo for the LoadImage node where they return the image hash as a string, if the image hash
         changes between executions the LoadImage node is executed again.
     """
-    #@classmethod
-    #def IS_CHANGED(s, image, string_field, int_field, float_field, print_to_screen):
-    #    return ""
+    @classmethod
+    def IS_CHANGED(s, regenerate="NO", **kwargs):
+        if regenerate=="YES":
+            return ALWAYS_CHANGED
+        return hash_inputs(templates=get_template_library().fingerprint(kwargs.get("template", "text_gen")), **kwargs)
 
 # Set the web directory, any .js file in that directory will be loaded by the frontend as a frontend extension
 # WEB_DIRECTORY = "./somejs"
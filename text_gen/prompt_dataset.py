@@ -0,0 +1,127 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def record_hash(prompt, negative, response):
+    return hashlib.sha256("\0".join([prompt or "", negative or "", response or ""]).encode("utf-8")).hexdigest()
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256((prompt or "").encode("utf-8")).hexdigest()
+
+
+class PromptDataset:
+    """
+    SQLite dataset of generated prompts.
+
+    Every record holds the user prompt, the generated negative prompt and response, free metadata and the
+    time it was added. Records are indexed by content hash, by prompt hash and by time, so lookups don't scan
+    the dataset and iteration streams rows instead of loading them all.
+
+    Attributes
+    ----------
+    path (`str`):
+        Path of the SQLite file.
+    """
+    def __init__(self, path):
+        self.path = path
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "id INTEGER PRIMARY KEY, hash TEXT NOT NULL UNIQUE, prompt_hash TEXT NOT NULL, time REAL NOT NULL, "
+            "prompt TEXT, negative TEXT, response TEXT, metadata TEXT)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS records_prompt_hash ON records(prompt_hash)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS records_time ON records(time)")
+        self._db.commit()
+
+    @staticmethod
+    def _to_dict(row):
+        record = dict(row)
+        if record.get("metadata"):
+            try:
+                record["metadata"] = json.loads(record["metadata"])
+            except ValueError:
+                pass
+        return record
+
+    def add(self, prompt, response, negative=None, metadata=None, timestamp=None):
+        """
+            Appends a record and returns its hash. A record identical to an existing one is not stored twice.
+        """
+        if metadata is not None and not isinstance(metadata, str):
+            metadata = json.dumps(metadata, ensure_ascii=False)
+        digest = record_hash(prompt, negative, response)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO records(hash, prompt_hash, time, prompt, negative, response, metadata) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (digest, prompt_hash(prompt), timestamp if timestamp is not None else time.time(), prompt, negative, response, metadata)
+            )
+            self._db.commit()
+        return digest
+
+    def get(self, digest):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM records WHERE hash=?", (digest,)).fetchone()
+        return self._to_dict(row) if row is not None else None
+
+    def find_prompt(self, prompt):
+        """
+            Returns the records generated from this exact prompt, newest first.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM records WHERE prompt_hash=? ORDER BY time DESC", (prompt_hash(prompt),)).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def iter_records(self, start=None, end=None, batch_size=500):
+        """
+            Yields records in insertion order, optionally limited to [start, end) timestamps.
+            Rows are fetched batch_size at a time, the dataset is never loaded at once.
+        """
+        last_id = 0
+        start = start if start is not None else float("-inf")
+        end = end if end is not None else float("inf")
+        while True:
+            with self._lock:
+                rows = self._db.execute(
+                    "SELECT * FROM records WHERE time >= ? AND time < ? AND id > ? ORDER BY id LIMIT ?",
+                    (start, end, last_id, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield self._to_dict(row)
+            last_id = rows[-1]["id"]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_datasets = {}
+_datasets_lock = threading.Lock()
+
+def open_dataset(path):
+    """
+        Returns the shared dataset of a path, opening it on first use.
+    """
+    key = os.path.abspath(path)
+    with _datasets_lock:
+        dataset = _datasets.get(key)
+        if dataset is None:
+            dataset = PromptDataset(path)
+            _datasets[key] = dataset
+        return dataset
@@ -0,0 +1,72 @@
+import threading
+import time
+
+# Websocket event listened to by web/lollms_text_visualize.js
+TEXT_EVENT = "lollms_nodes.text"
+
+
+def truncate_text(text, max_chars):
+    """
+        Keeps the beginning and the end of a text longer than max_chars, with a marker in place of the middle.
+    """
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    head = max_chars // 2
+    tail = max_chars - head
+    return f"{text[:head]}\n\n[... {len(text) - max_chars} characters truncated ...]\n\n{text[-tail:]}"
+
+
+def _send(node_id, message):
+    try:
+        from server import PromptServer
+        server = PromptServer.instance
+    except Exception:
+        # Not running in comfyui, there is no frontend to update
+        return
+    server.send_sync(TEXT_EVENT, dict(message, node=node_id), server.client_id)
+
+
+class TextDisplayStream:
+    """
+    Pushes a text to the viewer of a node while it is generated.
+
+    Chunks are buffered and sent at most every `interval` seconds as "append" messages, so the browser
+    receives a few messages per second whatever the token rate. Once the text grows past `max_chars`,
+    appending stops and the truncated text (beginning and end) replaces the display instead, so
+    the browser never holds more than about max_chars characters.
+    """
+    def __init__(self, node_id, max_chars=20000, interval=0.1):
+        self.node_id = node_id
+        self.max_chars = max_chars
+        self.interval = interval
+        self.text = ""
+        self._sent = 0
+        self._last_send = 0.0
+        self._lock = threading.Lock()
+        _send(node_id, {"reset": True})
+
+    def __call__(self, chunk):
+        with self._lock:
+            self.text += chunk
+            if time.monotonic() - self._last_send >= self.interval:
+                self._flush()
+        return True
+
+    def _flush(self):
+        self._last_send = time.monotonic()
+        if self.max_chars > 0 and len(self.text) > self.max_chars:
+            _send(self.node_id, {"text": truncate_text(self.text, self.max_chars)})
+        elif len(self.text) > self._sent:
+            _send(self.node_id, {"append": self.text[self._sent:]})
+        self._sent = len(self.text)
+
+    def finish(self, text=None):
+        """
+            Sends the final text, which replaces what was streamed (a cached answer is never streamed).
+        """
+        with self._lock:
+            if text is not None:
+                self.text = text
+            display = truncate_text(self.text, self.max_chars)
+            _send(self.node_id, {"text": display, "done": True})
+            return display
@@ -0,0 +1,175 @@
+import atexit
+import datetime
+import gzip
+import json
+import os
+import queue
+import tempfile
+import threading
+from collections import OrderedDict
+
+from ..common.metrics import get_logger, get_metrics
+from ..package_manager import PackageManager
+
+WRITE_MODES = ["overwrite", "append", "jsonl"]
+COMPRESSIONS = ["none", "gzip", "zstd"]
+
+logger = get_logger("text_writer")
+
+
+def make_record(text, prompt=None, metadata=None):
+    """
+        Builds a jsonl record, metadata is kept as an object when it is valid json.
+    """
+    record = {"time": datetime.datetime.now(datetime.timezone.utc).isoformat(), "response": text}
+    if prompt:
+        record["prompt"] = prompt
+    if metadata:
+        try:
+            record["metadata"] = json.loads(metadata)
+        except ValueError:
+            record["metadata"] = metadata
+    return record
+
+
+def encode_payload(mode, text, prompt=None, metadata=None):
+    if mode == "jsonl":
+        return (json.dumps(make_record(text, prompt, metadata), ensure_ascii=False) + "\n").encode("utf-8")
+    if mode == "append":
+        return (text + "\n").encode("utf-8")
+    return text.encode("utf-8")
+
+
+def check_compression(compression):
+    """
+        Raises a RuntimeError naming the missing package when the compression can't be used. Called before
+        queueing a write so the node fails instead of the background writer.
+    """
+    if compression == "zstd" and not PackageManager.check_package_installed("zstandard"):
+        raise RuntimeError("zstd compression needs the zstandard package, install it with: pip install zstandard")
+
+
+def compress(data, compression):
+    """
+        Compresses one block. gzip members and zstd frames can be concatenated,
+        so appended blocks still form a single valid compressed file.
+    """
+    if compression == "gzip":
+        return gzip.compress(data)
+    if compression == "zstd":
+        check_compression(compression)
+        import zstandard
+        return zstandard.ZstdCompressor().compress(data)
+    return data
+
+
+def write_blocks(path, mode, compression, payloads):
+    """
+        Writes the payloads of one file with a single fsync.
+        overwrite mode only keeps the last payload and replaces the file atomically through a temporary file.
+    """
+    with get_metrics().span("disk_write"):
+        _write_blocks(path, mode, compression, payloads)
+
+
+def _write_blocks(path, mode, compression, payloads):
+    folder = os.path.dirname(os.path.abspath(path))
+    os.makedirs(folder, exist_ok=True)
+    if mode == "overwrite":
+        descriptor, temp_path = tempfile.mkstemp(dir=folder, prefix=".tmp_", suffix=os.path.basename(path))
+        try:
+            with os.fdopen(descriptor, "wb") as f:
+                f.write(compress(payloads[-1], compression))
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates private files, keep the permissions a plain open() would give
+            os.chmod(temp_path, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    else:
+        with open(path, "ab") as f:
+            f.write(compress(b"".join(payloads), compression))
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class TextWriter:
+    """
+    Background writer used by Lollms_Text_Saver.
+
+    Writes are queued on a bounded queue (producers block when it is full) and a single thread
+    drains it in batches: all the payloads of a batch going to the same file are written with one
+    open and one fsync.
+
+    Attributes
+    ----------
+    max_queue (`int`):
+        Maximum number of pending writes.
+    batch_size (`int`):
+        Maximum number of writes handled per batch.
+    """
+    def __init__(self, max_queue=1024, batch_size=256):
+        self.batch_size = batch_size
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._error = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="lollms_text_writer", daemon=True)
+                self._thread.start()
+
+    def _raise_pending_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise RuntimeError(f"A previous asynchronous text write failed: {error}") from error
+
+    def submit(self, path, mode, compression, payload):
+        self._raise_pending_error()
+        self._ensure_started()
+        self._queue.put((path, mode, compression, payload))
+
+    def flush(self):
+        """
+            Blocks until every queued write is on disk.
+        """
+        if self._thread is not None:
+            self._queue.join()
+        self._raise_pending_error()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            groups = OrderedDict()
+            for path, mode, compression, payload in batch:
+                groups.setdefault((path, mode, compression), []).append(payload)
+            for (path, mode, compression), payloads in groups.items():
+                try:
+                    write_blocks(path, mode, compression, payloads)
+                except Exception as ex:
+                    logger.error("Couldn't write %s: %s", path, ex)
+                    self._error = ex
+            for _ in batch:
+                self._queue.task_done()
+
+
+_text_writer = None
+_text_writer_lock = threading.Lock()
+
+def get_text_writer():
+    global _text_writer
+    with _text_writer_lock:
+        if _text_writer is None:
+            _text_writer = TextWriter()
+            atexit.register(_text_writer.flush)
+        return _text_writer
@@ -0,0 +1,67 @@
+import math
+
+NOISE_DISTRIBUTIONS = ["gaussian", "uniform", "laplace"]
+
+
+def frame_noise(seed, index, shape, distribution="gaussian"):
+    """
+        Returns the zero mean, unit variance noise of one keyframe.
+        Every keyframe has its own cpu generator seeded from (seed, index), so the noise of a frame
+        doesn't depend on how the clip is split into chunks nor on the device.
+    """
+    import torch
+    generator = torch.Generator(device="cpu").manual_seed((seed * 1000003 + index) % 0xffffffffffffffff)
+    if distribution == "gaussian":
+        return torch.randn(shape, generator=generator)
+    if distribution == "uniform":
+        return (torch.rand(shape, generator=generator) * 2 - 1) * math.sqrt(3)
+    if distribution == "laplace":
+        uniform = torch.rand(shape, generator=generator) - 0.5
+        return -torch.sign(uniform) * torch.log1p(-2 * uniform.abs()) / math.sqrt(2)
+    raise ValueError(f"Unknown noise distribution {distribution}, expected one of {', '.join(NOISE_DISTRIBUTIONS)}")
+
+
+def iter_video_noise(frames, shape, seed, distribution="gaussian", keyframe_interval=1, chunk_size=16, device="cpu", dtype=None):
+    """
+        Yields `(start, chunk)` pairs covering a `[frames, *shape]` noise clip, `chunk_size` frames at a time.
+
+        With keyframe_interval > 1, noise is only drawn every keyframe_interval frames and the frames in
+        between are spherically interpolated between the two surrounding keyframes, which keeps consecutive
+        frames correlated while preserving unit variance. Only the current chunk and two keyframes are in memory.
+    """
+    import torch
+    dtype = dtype or torch.float32
+    keyframe_interval = max(1, keyframe_interval)
+    keyframes = {}
+    for start in range(0, frames, chunk_size):
+        end = min(start + chunk_size, frames)
+        chunk = torch.empty((end - start, *shape), dtype=dtype, device=device)
+        for frame in range(start, end):
+            key, offset = divmod(frame, keyframe_interval)
+            for needed in (key, key + 1) if offset else (key,):
+                if needed not in keyframes:
+                    keyframes[needed] = frame_noise(seed, needed, shape, distribution)
+            if offset == 0:
+                noise = keyframes[key]
+            else:
+                angle = offset / keyframe_interval * math.pi / 2
+                noise = math.cos(angle) * keyframes[key] + math.sin(angle) * keyframes[key + 1]
+            chunk[frame - start].copy_(noise)
+            for old in [old for old in keyframes if old < key]:
+                del keyframes[old]
+        yield start, chunk
+
+
+def generate_video_noise(frames, shape, seed, distribution="gaussian", keyframe_interval=1, chunk_size=16, scale=1.0, device="cpu", dtype=None):
+    """
+        Builds the whole noise clip, filling a preallocated tensor chunk by chunk so the peak memory
+        is the output plus one chunk, whatever the number of frames.
+    """
+    import torch
+    dtype = dtype or torch.float32
+    output = torch.empty((frames, *shape), dtype=dtype, device=device)
+    for start, chunk in iter_video_noise(frames, shape, seed, distribution, keyframe_interval, chunk_size, device, dtype):
+        if scale != 1.0:
+            chunk.mul_(scale)
+        output[start:start + chunk.shape[0]] = chunk
+    return output
@@ -1,11 +1,7 @@
-from ..package_manager import PackageManager
-if not PackageManager.check_package_installed("lollms_client"):
-    PackageManager.install_package("lollms_client")
-
-import comfy.model_management
-from lollms_client import LollmsClient
-import torch
-from torchvision.transforms import Compose, Resize, CenterCrop
+from ..common.change_detection import hash_inputs
+from ..common.latents import LATENT_DTYPES, ensure_memory_available, tensor_nbytes, torch_dtype
+from ..common.metrics import get_metrics, instrument_node
+from .latent_noise import NOISE_DISTRIBUTIONS, generate_video_noise
 
 MAX_RESOLUTION=16384
 
@@ -39,6 +35,7 @@ class RandomizeVideo:
         For Artbot, if `FUNCTION = "execute"` then this method's name must be `execute`, if `FUNCTION = "foo"` then it must be `foo`.
     """
     def __init__(self):
+        import comfy.model_management
         self.device = comfy.model_management.intermediate_device()
     
     @classmethod
@@ -60,11 +57,19 @@ class RandomizeVideo:
         return {
             "required": {
                 "input_image":("IMAGE",), 
+                "seed": ("INT", {"default": 0, "min": 0, "max": 0xffffffffffffffff}),
+                "distribution":(NOISE_DISTRIBUTIONS,),
+                "keyframe_interval": ("INT", {"default": 1, "min": 1, "max": 4096}),
+                "chunk_size": ("INT", {"default": 16, "min": 1, "max": 4096}),
+                "scale": ("FLOAT", {"default": 1.0, "min": 0.0, "max": 100.0, "step": 0.01}),
+            },
+            "optional": {
+                "latent_dtype":(LATENT_DTYPES,),
             },
         }
 
-    RETURN_TYPES = ("LATENT")
-    RETURN_NAMES = ("Latent Images")
+    RETURN_TYPES = ("LATENT",)
+    RETURN_NAMES = ("Latent Images",)
 
     FUNCTION = "generate_random_images"
 
@@ -72,12 +77,19 @@ class RandomizeVideo:
 
     CATEGORY = "Lollms/Video/Randomize_Video"
 
-    def generate_random_images(self, input_image=None):
+    @instrument_node
+    def generate_random_images(self, input_image=None, seed=0, distribution="gaussian", keyframe_interval=1, chunk_size=16, scale=1.0, latent_dtype="float32"):
         batch_size = input_image.shape[0]
         height = input_image.shape[1]
         width = input_image.shape[2]
+        shape = (4, height // 8, width // 8)
+        # Only the output and one chunk are allocated, reject what can't fit before allocating anything
+        required = tensor_nbytes((batch_size,) + shape, latent_dtype) + tensor_nbytes((min(chunk_size, batch_size),) + shape, latent_dtype)
+        ensure_memory_available(required, self.device, "The RandomizeVideo latent batch", "Use fewer frames, a lower resolution or a 16 bit latent_dtype.")
 
-        latent = torch.randint(0,255,[batch_size, 4, height // 8, width // 8], device=self.device)
+        # One latent frame per input frame, keyframe_interval > 1 gives temporally coherent noise
+        with get_metrics().span("noise"):
+            latent = generate_video_noise(batch_size, shape, seed, distribution, keyframe_interval, chunk_size, scale, device=self.device, dtype=torch_dtype(latent_dtype))
 
         return ({"samples":latent},)
 
@@ -89,9 +101,9 @@ class RandomizeVideo:
         This method is used in the core repo for the LoadImage node where they return the image hash as a string, if the image hash
         changes between executions the LoadImage node is executed again.
     """
-    #@classmethod
-    #def IS_CHANGED(s, image, string_field, int_field, float_field, print_to_screen):
-    #    return ""
+    @classmethod
+    def IS_CHANGED(s, **kwargs):
+        return hash_inputs(**kwargs)
 
 # Set the web directory, any .js file in that directory will be loaded by the frontend as a frontend extension
 # WEB_DIRECTORY = "./somejs"
@@ -0,0 +1,64 @@
+import { app } from "../../scripts/app.js";
+import { api } from "../../scripts/api.js";
+import { ComfyWidgets } from "../../scripts/widgets.js";
+
+// Shows the text of Lollms_Text_Visualize nodes, updated while lollms streams it (see text_gen/text_display.py)
+const NODE_TYPE = "Lollms_Text_Visualize";
+const TEXT_EVENT = "lollms_nodes.text";
+
+function getDisplayWidget(node) {
+    if (!node.lollmsDisplay) {
+        const widget = ComfyWidgets["STRING"](node, "display", ["STRING", { multiline: true }], app).widget;
+        widget.inputEl.readOnly = true;
+        widget.inputEl.style.opacity = 0.8;
+        widget.serialize = false;
+        node.lollmsDisplay = widget;
+    }
+    return node.lollmsDisplay;
+}
+
+function setText(node, text) {
+    const widget = getDisplayWidget(node);
+    widget.value = text;
+    widget.inputEl.scrollTop = widget.inputEl.scrollHeight;
+    app.graph.setDirtyCanvas(true, false);
+}
+
+app.registerExtension({
+    name: "lollms_nodes_suite.TextVisualize",
+
+    setup() {
+        api.addEventListener(TEXT_EVENT, ({ detail }) => {
+            const node = app.graph.getNodeById(Number(detail.node));
+            if (!node || node.comfyClass !== NODE_TYPE) {
+                return;
+            }
+            if (detail.reset) {
+                setText(node, "");
+            } else if (detail.append !== undefined) {
+                setText(node, getDisplayWidget(node).value + detail.append);
+            } else if (detail.text !== undefined) {
+                setText(node, detail.text);
+            }
+        });
+    },
+
+    async beforeRegisterNodeDef(nodeType, nodeData) {
+        if (nodeData.name !== NODE_TYPE) {
+            return;
+        }
+        const onNodeCreated = nodeType.prototype.onNodeCreated;
+        nodeType.prototype.onNodeCreated = function () {
+            const result = onNodeCreated?.apply(this, arguments);
+            getDisplayWidget(this);
+            return result;
+        };
+        const onExecuted = nodeType.prototype.onExecuted;
+        nodeType.prototype.onExecuted = function (message) {
+            onExecuted?.apply(this, arguments);
+            if (message?.text) {
+                setText(this, message.text.join(""));
+            }
+        };
+    },
+});